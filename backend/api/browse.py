@@ -1,13 +1,23 @@
-from typing import Literal
+import base64
+import binascii
+from typing import Any, Literal
 
+import aiocache
 from pydantic import Field
 
 import nebula
-from nebula.common import SerializableValue, sql_list
+from nebula.common import (
+    SerializableValue,
+    hash_data,
+    json_dumpb,
+    json_loads,
+    sql_list,
+)
 from nebula.enum import MetaClass
 from nebula.exceptions import NebulaException
+from nebula.helpers.coalescer import Coalescer
+from nebula.helpers.fulltext import build_search_query
 from nebula.metadata.normalize import normalize_meta
-from nx.utils import slugify
 from server.dependencies import CurrentUser
 from server.models import RequestModel, ResponseModel
 from server.request import APIRequest
@@ -39,6 +49,10 @@ ConditionOperator = Literal[
 ]
 
 
+# Rows of a page and the cursor of the next page
+BrowsePage = tuple[list[dict[str, Any]], str | None]
+
+
 class ConditionModel(RequestModel):
     key: str = Field(..., examples=["status"])
     value: SerializableValue = Field(None, examples=[1])
@@ -76,7 +90,18 @@ class BrowseRequestModel(RequestModel):
     ignore_view_conditions: bool = Field(False, title="Ignore view conditions")
     limit: int = Field(500, title="Limit", description="Maximum number of items")
     offset: int = Field(0, title="Offset", description="Offset")
-    order_by: str | None = Field("ctime", title="Order by")
+    cursor: str | None = Field(
+        None,
+        title="Cursor",
+        description="Return the page following the one which returned "
+        "this cursor as next_cursor. When set, offset is ignored.",
+    )
+    order_by: str | None = Field(
+        "ctime",
+        title="Order by",
+        description="Metadata key to sort by. Use 'relevance' to sort "
+        "search results by the weight of the matched words.",
+    )
     order_dir: OrderDirection = Field("desc", title="Order direction")
 
 
@@ -99,6 +124,11 @@ class BrowseResponseModel(ResponseModel):
     )
     order_by: str | None = Field(None)
     order_dir: OrderDirection = Field(...)
+    next_cursor: str | None = Field(
+        None,
+        title="Next cursor",
+        description="Cursor of the next page. None if there are no more items",
+    )
 
 
 #
@@ -106,6 +136,111 @@ class BrowseResponseModel(ResponseModel):
 #
 
 
+async def fetch_page(
+    query: str,
+    limit: int,
+    order_by: str,
+    order_dir: OrderDirection,
+) -> BrowsePage:
+    """Execute a browse query and return the rows and the next page cursor"""
+
+    # Rows are fetched at once. Iterating over a server-side cursor
+    # would cost a round trip per every 50 rows.
+
+    records: list[dict[str, Any]] = []
+    last_sort_key = None
+    has_more = False
+    for record in await nebula.db.fetch(query):
+        if len(records) >= limit:
+            has_more = True
+            break
+        records.append(record["meta"])
+        last_sort_key = record["sort_key"]
+
+    next_cursor: str | None = None
+    if has_more and records:
+        next_cursor = encode_cursor(
+            order_by, order_dir, last_sort_key, records[-1]["id"]
+        )
+    return records, next_cursor
+
+
+class BrowseCache:
+    """In-process cache of browse results
+
+    Results are keyed by the generated SQL query, which contains
+    the view, search query, conditions, order, page and the access
+    control conditions of the user. The cache is cleared whenever
+    an asset is changed. Changes saved without a notification are
+    covered by a short TTL.
+    """
+
+    ttl: int = 60
+
+    def __init__(self) -> None:
+        self.cache = aiocache.SimpleMemoryCache()
+        self.generation = 0
+
+    async def get(self, key: str) -> BrowsePage | None:
+        return await self.cache.get(key)
+
+    async def fetch(
+        self,
+        key: str,
+        query: str,
+        limit: int,
+        order_by: str,
+        order_dir: OrderDirection,
+    ) -> BrowsePage:
+        generation = self.generation
+        page = await fetch_page(query, limit, order_by, order_dir)
+        # Do not store results of queries which were running
+        # when the cache was invalidated. They may be outdated.
+        if generation == self.generation:
+            await self.cache.set(key, page, ttl=self.ttl)
+        return page
+
+    async def invalidate(self) -> None:
+        self.generation += 1
+        await self.cache.clear()
+
+    async def on_message(self, message: dict[str, Any]) -> None:
+        if message["topic"] != "objects_changed":
+            return
+        if message["data"].get("object_type") == "asset":
+            await self.invalidate()
+
+
+browse_cache = BrowseCache()
+
+
+async def fetch_cached_page(
+    key: str,
+    query: str,
+    limit: int,
+    order_by: str,
+    order_dir: OrderDirection,
+) -> BrowsePage:
+    return await browse_cache.fetch(key, query, limit, order_by, order_dir)
+
+
+async def get_page(
+    query: str,
+    limit: int,
+    order_by: str,
+    order_dir: OrderDirection,
+) -> BrowsePage:
+    """Return a cached browse page or fetch it.
+
+    Identical concurrent requests share a single database query.
+    """
+    key = hash_data([query, order_dir])
+    if (page := await browse_cache.get(key)) is not None:
+        return page
+    coalesce = Coalescer()
+    return await coalesce(fetch_cached_page, key, query, limit, order_by, order_dir)
+
+
 def sanitize_value(value: SerializableValue) -> str:
     if isinstance(value, str):
         value = value.replace("'", "''")
@@ -156,6 +291,15 @@ def build_order(order_by: str) -> str:
     # Ensure the key is in the columns list
     # This effectively prevents SQL injections
 
+    if order_by == "relevance":
+        return "ft_rank"
+
+    # Database columns are indexed integers and cannot be NULL,
+    # so they are used as they are to keep the index usable
+
+    if order_by in nebula.Asset.db_columns:
+        return order_by
+
     cast_order_by = None
     if order_by_type := nebula.settings.metatypes.get(order_by):
         match order_by_type.metaclass:
@@ -166,18 +310,72 @@ def build_order(order_by: str) -> str:
             case _:
                 cast_order_by = None
 
-    # By default try to sort by database columns,
-    # since they are indexed and faster. It the user
-    # wants to sort by a key which is not a database
-    # column, we need to sort by the JSONB key
+    # If the user wants to sort by a key which is not
+    # a database column, we need to sort by the JSONB key.
+    # NULL values are coalesced, so the sort key may be
+    # compared when paginating using a cursor.
 
-    if order_by not in nebula.Asset.db_columns:
-        order_by = f"meta->>'{order_by}'"
+    order_by = f"meta->>'{order_by}'"
 
     if cast_order_by:
-        order_by = f"COALESCE(CAST({order_by} AS {cast_order_by}), 0)"
+        return f"COALESCE(CAST({order_by} AS {cast_order_by}), 0)"
+    return f"COALESCE({order_by}, '')"
+
 
-    return order_by
+def get_order_by(request: BrowseRequestModel, columns: set[str]) -> str:
+    """Return the key the result will be sorted by"""
+    if request.order_by == "relevance":
+        # Relevance is available only when searching
+        return "relevance" if build_search_query(request.query) else "ctime"
+    if request.order_by and request.order_by in list(columns) + ["ctime"]:
+        return request.order_by
+    return "ctime"
+
+
+#
+# Keyset pagination
+#
+# Cursor is an opaque token identifying the last row of a page.
+# It holds the sort key and the ID of the row, so the next page
+# starts right after it instead of skipping `offset` rows.
+#
+
+
+def encode_cursor(order_by: str, order_dir: str, value: Any, id: int) -> str:
+    if not isinstance(value, int | str):
+        # Numeric values (Decimal) are stored as strings to keep
+        # them exact. Postgres casts them back when comparing.
+        value = str(value)
+    payload = json_dumpb([order_by, order_dir, value, id])
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[str, str, Any, int]:
+    try:
+        order_by, order_dir, value, id = json_loads(base64.urlsafe_b64decode(cursor))
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise nebula.BadRequestException("Invalid cursor") from e
+    if not isinstance(id, int) or not isinstance(value, int | str):
+        raise nebula.BadRequestException("Invalid cursor")
+    return order_by, order_dir, value, id
+
+
+def build_cursor_condition(
+    request: BrowseRequestModel,
+    order_by: str,
+    order_expr: str,
+) -> str:
+    """Return a condition selecting rows after the request cursor"""
+    assert request.cursor is not None
+    cur_order_by, cur_order_dir, value, last_id = decode_cursor(request.cursor)
+    if cur_order_by != order_by or cur_order_dir != request.order_dir:
+        raise nebula.BadRequestException("Cursor does not match the requested order")
+
+    value = f"'{sanitize_value(value)}'"
+    if request.order_dir == "desc":
+        return f"({order_expr}, id) < ({value}, {last_id})"
+    # Rows are always sorted by id DESC as a tiebreaker
+    return f"({order_expr} > {value} OR ({order_expr} = {value} AND id < {last_id}))"
 
 
 def build_query(
@@ -213,17 +411,11 @@ def build_query(
         cond_list.extend(build_conditions(request.conditions))
 
     # Process full text
+    # Matching assets are joined with their search rank
 
-    if request.query:
-        for elm in slugify(request.query, make_set=True, min_length=3):
-            # no need to sanitize this. slugified strings are safe
-            q = f"""
-                id IN (
-                    SELECT id FROM ft
-                    WHERE object_type = 0 AND value LIKE '{elm}%'
-                )
-            """
-            cond_list.append(q)
+    source = "assets"
+    if search_query := build_search_query(request.query):
+        source = f"assets JOIN ({search_query}) AS ft_search ON ft_id = id"
 
     # Access control
 
@@ -235,26 +427,40 @@ def build_query(
     if (can_view := user["can/asset_view"]) and isinstance(can_view, list):
         cond_list.append(f"id_folder IN {sql_list(can_view)}")
 
+    # Build order
+
+    order_by = get_order_by(request, columns)
+    order_expr = build_order(order_by)
+
+    offset = request.offset
+    if request.cursor:
+        cond_list.append(build_cursor_condition(request, order_by, order_expr))
+        offset = 0
+
     # Build conditions
 
     conds = "WHERE " + " AND ".join(cond_list) if cond_list else ""
 
-    # Build order
-
-    if request.order_by in list(columns) + ["ctime"]:
-        order_by = request.order_by
-    else:
-        order_by = "ctime"
+    # Build projection
+    # Only the requested keys leave the database
 
-    order_by = build_order(order_by)
+    keys = sql_list([sanitize_value(column) for column in sorted(columns)], t="str")
+    projection = f"""
+        COALESCE(
+            (SELECT jsonb_object_agg(key, value) FROM jsonb_each(meta)
+            WHERE key IN {keys}),
+            '{{}}'::JSONB
+        )
+    """
 
     # Build query
+    # One extra row is fetched to find out whether there is a next page
 
     query = f"""
-        SELECT meta FROM assets {conds}
-        ORDER BY {order_by} {request.order_dir}, id DESC
-        LIMIT {request.limit}
-        OFFSET {request.offset}
+        SELECT {projection} AS meta, {order_expr} AS sort_key FROM {source} {conds}
+        ORDER BY {order_expr} {request.order_dir}, id DESC
+        LIMIT {request.limit + 1}
+        OFFSET {offset}
     """
     return query
 
@@ -286,17 +492,19 @@ class Request(APIRequest):
             all_columns.add("mark_out")
 
         query = build_query(request, all_columns, user)
+        order_by = get_order_by(request, all_columns)
+
+        records, next_cursor = await get_page(
+            query,
+            request.limit,
+            order_by,
+            request.order_dir,
+        )
 
-        records = []
-        async for record in nebula.db.iterate(query):
-            row = {}
-            for column in all_columns:
-                if column in record["meta"]:
-                    row[column] = record["meta"][column]
-            records.append(row)
         return BrowseResponseModel(
             columns=columns,
             data=records,
             order_by=request.order_by,
             order_dir=request.order_dir,
+            next_cursor=next_cursor,
         )
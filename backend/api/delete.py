@@ -4,7 +4,8 @@ from pydantic import Field
 
 import nebula
 from nebula.enum import ObjectType
-from nebula.helpers.scheduling import bin_refresh
+from nebula.helpers.scheduling import enqueue_bin_refresh
+from nebula.objects.identity_map import evict_objects
 from nebula.objects.utils import get_object_class_by_name
 from server.dependencies import CurrentUser, RequestInitiator
 from server.models import RequestModel
@@ -54,7 +55,8 @@ class Request(APIRequest):
                     raise nebula.ConflictException(
                         "Cannot delete item because it was already aired"
                     ) from e
-                await bin_refresh(list(affected_bins), initiator=initiator)
+                evict_objects("item", request.ids)
+                await enqueue_bin_refresh(list(affected_bins), initiator=initiator)
                 return Response(status_code=204)
 
             case ObjectType.USER:
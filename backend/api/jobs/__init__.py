@@ -1,5 +1,6 @@
-__all__ = ["JobsRequest", "ActionsRequest", "SendRequest"]
+__all__ = ["JobsRequest", "ActionsRequest", "SendRequest", "ClaimJobsRequest"]
 
 from .actions_request import ActionsRequest
+from .claim_request import ClaimJobsRequest
 from .jobs_request import JobsRequest
 from .send_request import SendRequest
@@ -43,6 +43,7 @@ class ActionsRequest(APIRequest):
         user: CurrentUser,
     ) -> ActionsResponseModel:
         result = []
+        assets: list[nebula.Asset] | None = None
 
         query = """
             SELECT id, service_type, title, settings
@@ -63,8 +64,12 @@ class ActionsRequest(APIRequest):
                 if not allow_if_cond:
                     continue
 
-                for id_asset in request.ids:
-                    asset = await nebula.Asset.load(id_asset)
+                if assets is None:
+                    assets = await nebula.Asset.load_many(request.ids)
+                    if len(assets) != len(request.ids):
+                        raise nebula.NotFoundException("Asset not found")
+
+                for asset in assets:
                     assert asset
                     if not eval(allow_if_cond):
                         break
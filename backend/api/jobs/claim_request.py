@@ -0,0 +1,142 @@
+import asyncio
+from typing import Any
+
+from pydantic import Field
+
+import nebula
+from server.dependencies import CurrentUser
+from server.models import RequestModel, ResponseModel
+from server.request import APIRequest
+
+from .dispatcher import (
+    DEFAULT_LEASE,
+    claim_jobs,
+    get_allowed_actions,
+    get_service_type,
+    pending_jobs,
+    renew_leases,
+    requeue_expired,
+)
+
+
+class ClaimJobsRequestModel(RequestModel):
+    id_service: int = Field(
+        ...,
+        title="Service ID",
+        description="ID of the service claiming the jobs",
+        examples=[3],
+    )
+    limit: int = Field(
+        1,
+        title="Limit",
+        description="Maximum number of jobs to claim. Use 0 to renew the leases only",
+        ge=0,
+        le=100,
+    )
+    lease: int = Field(
+        DEFAULT_LEASE,
+        title="Lease",
+        description="Number of seconds the claimed and renewed jobs belong "
+        "to the service. Jobs which are not renewed in time are requeued",
+        ge=10,
+        le=86400,
+    )
+    wait: float = Field(
+        0,
+        title="Wait",
+        description="When there are no pending jobs, wait up to the given "
+        "number of seconds for new ones instead of returning immediately",
+        ge=0,
+        le=60,
+    )
+    renew: list[int] = Field(
+        default_factory=list,
+        title="Renew",
+        description="IDs of running jobs of the service to renew the lease of",
+        examples=[[42]],
+    )
+
+
+class ClaimedJobModel(ResponseModel):
+    id: int = Field(..., title="Job ID", examples=[42])
+    id_action: int = Field(..., title="Action ID", examples=[1])
+    id_asset: int = Field(..., title="Asset ID", examples=[69])
+    id_user: int | None = Field(None, title="User ID")
+    settings: dict[str, Any] | None = Field(None, title="Job settings")
+    priority: int = Field(3, title="Priority", examples=[3])
+    retries: int = Field(0, title="Retries", examples=[0])
+    lease_until: int = Field(..., title="Lease expiration time")
+
+
+class ClaimJobsResponseModel(ResponseModel):
+    jobs: list[ClaimedJobModel] = Field(
+        default_factory=list,
+        title="Claimed jobs",
+        description="Jobs claimed by the service in the processing order",
+    )
+    renewed: list[int] = Field(
+        default_factory=list,
+        title="Renewed jobs",
+        description="IDs of the jobs with a renewed lease. "
+        "Services should stop working on the requested jobs not listed here",
+    )
+
+
+class ClaimJobsRequest(APIRequest):
+    """Claim pending jobs for a worker service
+
+    Claims the next pending jobs of the service type ordered
+    by priority and creation time. Concurrent services never
+    receive the same job. Leases of running jobs may be renewed
+    using the same request. Users allowed to control jobs of some
+    actions only claim jobs of these actions.
+    """
+
+    name = "claim-jobs"
+    title = "Claim jobs"
+    response_model = ClaimJobsResponseModel
+
+    async def handle(
+        self,
+        request: ClaimJobsRequestModel,
+        user: CurrentUser,
+    ) -> ClaimJobsResponseModel:
+        if not user.can("job_control", anyval=True):
+            raise nebula.ForbiddenException("You are not allowed to claim jobs")
+        id_actions = get_allowed_actions(user)
+
+        service_type = await get_service_type(request.id_service)
+        renewed = await renew_leases(request.id_service, request.renew, request.lease)
+
+        await requeue_expired(service_type)
+
+        deadline = asyncio.get_running_loop().time() + request.wait
+        with pending_jobs.register(service_type) as pending:
+            jobs = await claim_jobs(
+                request.id_service,
+                service_type,
+                request.limit,
+                request.lease,
+                id_actions,
+            )
+            while request.limit and request.wait and not jobs:
+                if not await pending_jobs.wait(pending, deadline):
+                    break
+                jobs = await claim_jobs(
+                    request.id_service,
+                    service_type,
+                    request.limit,
+                    request.lease,
+                    id_actions,
+                )
+
+        if jobs:
+            nebula.log.info(
+                f"Service {request.id_service} claimed {len(jobs)} jobs",
+                user=user.name,
+            )
+
+        return ClaimJobsResponseModel(
+            jobs=[ClaimedJobModel(**job) for job in jobs],
+            renewed=renewed,
+        )
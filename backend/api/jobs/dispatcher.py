@@ -0,0 +1,279 @@
+"""Dispatching of pending jobs to worker services.
+
+Services claim the next pending jobs of their service type using a single
+statement with `FOR UPDATE SKIP LOCKED`, so concurrent workers never wait
+for each other or receive the same job. A claimed job is leased to the
+service for a limited time. Services renew the leases of the jobs they are
+working on; jobs with an expired lease are requeued on the next claim
+of their service type, or marked as failed after too many retries.
+
+When new jobs are created or restarted, a `jobs_pending` message is
+published. Idle services may wait for it (using a long-polling claim
+request or by subscribing to the message) instead of polling the table.
+"""
+
+import asyncio
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+import nebula
+from nebula.enum import JobState
+
+DEFAULT_LEASE = 120
+
+# Jobs with a lease expired more times than this are not requeued
+MAX_RETRIES = 3
+
+
+async def notify_pending(service_types: list[str]) -> None:
+    """Wake services waiting for jobs of the given types"""
+    if service_types:
+        await nebula.msg("jobs_pending", service_types=sorted(set(service_types)))
+
+
+async def notify_progress(jobs: list[dict[str, Any]]) -> None:
+    """Publish progress of multiple jobs using a single message.
+
+    Each job is a dict with the same keys as a single-job `job_progress`
+    message (id, status, progress and message). Clients accept both forms.
+    """
+    if jobs:
+        await nebula.msg("job_progress", jobs=jobs)
+
+
+async def get_service_type(id_service: int) -> str:
+    res = await nebula.db.fetch(
+        "SELECT service_type FROM services WHERE id = $1",
+        id_service,
+    )
+    if not res:
+        raise nebula.NotFoundException(f"Service {id_service} not found")
+    return res[0]["service_type"]
+
+
+def get_allowed_actions(user: nebula.User) -> list[int] | None:
+    """Return IDs of actions the user may control jobs of (None for all)"""
+    if user.is_admin or user["can/job_control"] is True:
+        return None
+    if isinstance(allowed := user["can/job_control"], list):
+        return [int(id_action) for id_action in allowed]
+    return []
+
+
+async def requeue_expired(service_type: str) -> list[int]:
+    """Return jobs of a service type with an expired lease to the queue.
+
+    Jobs which already exceeded MAX_RETRIES are marked as failed instead.
+    Rows locked by concurrent requests are skipped, as they are being
+    requeued or claimed already. Return IDs of the requeued jobs.
+    """
+    query = """
+        WITH expired AS (
+            SELECT j.id
+            FROM jobs AS j
+            JOIN actions AS a ON a.id = j.id_action
+            WHERE j.status = $4 AND j.lease_until < $5 AND a.service_type = $6
+            FOR UPDATE OF j SKIP LOCKED
+        )
+        UPDATE jobs SET
+            status = CASE WHEN retries >= $3 THEN $2 ELSE $1 END,
+            id_service = NULL,
+            start_time = NULL,
+            end_time = CASE WHEN retries >= $3 THEN $5 END,
+            lease_until = NULL,
+            progress = 0,
+            retries = retries + 1,
+            message = CASE WHEN retries >= $3
+                THEN 'Lease expired. Too many retries'
+                ELSE 'Lease expired. Requeued'
+            END
+        FROM expired AS e
+        WHERE jobs.id = e.id
+        RETURNING jobs.id, jobs.status, jobs.message
+    """
+    rows = await nebula.db.fetch(
+        query,
+        JobState.RESTART,
+        JobState.FAILED,
+        MAX_RETRIES,
+        JobState.IN_PROGRESS,
+        int(time.time()),
+        service_type,
+    )
+    requeued = [row for row in rows if row["status"] == JobState.RESTART]
+    if failed := len(rows) - len(requeued):
+        nebula.log.error(f"{failed} jobs failed after too many expired leases")
+    if requeued:
+        nebula.log.warn(f"Requeued {len(requeued)} jobs with an expired lease")
+        await notify_pending([service_type])
+    await notify_progress(
+        [
+            {
+                "id": row["id"],
+                "progress": 0,
+                "status": row["status"],
+                "message": row["message"],
+            }
+            for row in rows
+        ]
+    )
+    return [row["id"] for row in requeued]
+
+
+async def claim_jobs(
+    id_service: int,
+    service_type: str,
+    limit: int = 1,
+    lease: int = DEFAULT_LEASE,
+    id_actions: list[int] | None = None,
+) -> list[dict[str, Any]]:
+    """Claim the next pending jobs of the given service type.
+
+    Jobs are ordered by priority and creation time. Rows locked
+    by concurrent claims are skipped. When `id_actions` is given,
+    only jobs of these actions are claimed. Return the claimed jobs
+    in the order they should be processed.
+    """
+    if limit < 1:
+        return []
+
+    now = int(time.time())
+    query = """
+        WITH candidates AS (
+            SELECT j.id
+            FROM jobs AS j
+            JOIN actions AS a ON a.id = j.id_action
+            WHERE j.status IN ($1, $2) AND a.service_type = $3
+            AND ($9::INTEGER[] IS NULL OR j.id_action = ANY($9::INTEGER[]))
+            ORDER BY j.priority DESC, j.creation_time ASC, j.id ASC
+            LIMIT $4
+            FOR UPDATE OF j SKIP LOCKED
+        )
+        UPDATE jobs SET
+            status = $5,
+            id_service = $6,
+            start_time = $7,
+            end_time = NULL,
+            lease_until = $8,
+            progress = 0,
+            message = 'Starting'
+        FROM candidates AS c
+        WHERE jobs.id = c.id
+        RETURNING
+            jobs.id,
+            jobs.id_action,
+            jobs.id_asset,
+            jobs.id_user,
+            jobs.settings,
+            jobs.priority,
+            jobs.retries,
+            jobs.creation_time,
+            jobs.lease_until
+    """
+    rows = await nebula.db.fetch(
+        query,
+        JobState.PENDING,
+        JobState.RESTART,
+        service_type,
+        limit,
+        JobState.IN_PROGRESS,
+        id_service,
+        now,
+        now + lease,
+        id_actions,
+    )
+    jobs = sorted(
+        (dict(row) for row in rows),
+        key=lambda job: (-job["priority"], job["creation_time"] or 0, job["id"]),
+    )
+    await notify_progress(
+        [
+            {
+                "id": job["id"],
+                "id_asset": job["id_asset"],
+                "id_action": job["id_action"],
+                "id_service": id_service,
+                "progress": 0,
+                "status": JobState.IN_PROGRESS,
+                "message": "Starting",
+            }
+            for job in jobs
+        ]
+    )
+    return jobs
+
+
+async def renew_leases(
+    id_service: int,
+    ids: list[int],
+    lease: int = DEFAULT_LEASE,
+) -> list[int]:
+    """Extend leases of running jobs claimed by the given service.
+
+    Return IDs of the renewed jobs. Jobs which are missing from the result
+    were requeued, aborted or claimed by another service in the meantime.
+    """
+    if not ids:
+        return []
+    query = """
+        UPDATE jobs SET lease_until = $1
+        WHERE id = ANY($2) AND id_service = $3 AND status = $4
+        RETURNING id
+    """
+    return [
+        row["id"]
+        for row in await nebula.db.fetch(
+            query,
+            int(time.time()) + lease,
+            ids,
+            id_service,
+            JobState.IN_PROGRESS,
+        )
+    ]
+
+
+class PendingJobsWaiters:
+    """Claim requests waiting for new jobs in this server process"""
+
+    def __init__(self) -> None:
+        self.waiters: dict[str, set[asyncio.Event]] = {}
+
+    @contextmanager
+    def register(self, service_type: str) -> Iterator[asyncio.Event]:
+        """Return an event set when jobs of the given type are pending.
+
+        Register it before checking the queue, so messages published
+        between the check and the wait are not missed.
+        """
+        event = asyncio.Event()
+        self.waiters.setdefault(service_type, set()).add(event)
+        try:
+            yield event
+        finally:
+            self.waiters[service_type].discard(event)
+
+    @staticmethod
+    async def wait(event: asyncio.Event, deadline: float) -> bool:
+        """Wait until the registered event is set and clear it.
+
+        Return False when the deadline (monotonic time) passed.
+        """
+        try:
+            async with asyncio.timeout_at(deadline):
+                await event.wait()
+        except TimeoutError:
+            return False
+        event.clear()
+        return True
+
+    async def on_message(self, message: dict[str, Any]) -> None:
+        if message["topic"] != "jobs_pending":
+            return
+        for service_type in message["data"].get("service_types") or []:
+            for event in self.waiters.get(service_type, set()):
+                event.set()
+
+
+pending_jobs = PendingJobsWaiters()
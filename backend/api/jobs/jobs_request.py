@@ -5,11 +5,13 @@ from pydantic import Field
 
 import nebula
 from nebula.enum import JobState
-from nx.utils import slugify
+from nebula.helpers.fulltext import build_search_query
 from server.dependencies import CurrentUser
 from server.models import RequestModel, ResponseModel
 from server.request import APIRequest
 
+from .dispatcher import notify_pending
+
 #
 # Jobs
 #
@@ -134,13 +136,17 @@ async def restart_job(id_job: int, user: nebula.User) -> None:
         id_service=NULL,
         start_time=NULL,
         end_time=NULL,
+        lease_until=NULL,
         status=5,
         retries=0,
         progress=0,
         message=$1
         WHERE id = $2
+        RETURNING (
+            SELECT service_type FROM actions WHERE actions.id = jobs.id_action
+        ) AS service_type
     """
-    await nebula.db.execute(query, message, id_job)
+    res = await nebula.db.fetch(query, message, id_job)
     await nebula.msg(
         "job_progress",
         id=id_job,
@@ -148,6 +154,7 @@ async def restart_job(id_job: int, user: nebula.User) -> None:
         status=5,
         message=message,
     )
+    await notify_pending([row["service_type"] for row in res])
 
 
 async def abort_job(id_job: int, user: nebula.User) -> None:
@@ -204,9 +211,8 @@ class JobsRequest(APIRequest):
         # Return a list of jobs if requested
 
         conds = []
-        if request.search_query:
-            for elm in slugify(request.search_query, make_set=True):
-                conds.append(f"a.id IN (SELECT id FROM ft WHERE value LIKE '{elm}%')")
+        if search_query := build_search_query(request.search_query, min_length=1):
+            conds.append(f"a.id IN (SELECT ft_id FROM ({search_query}) AS ft_search)")
 
         if user.is_limited:
             conds.append(
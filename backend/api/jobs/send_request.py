@@ -8,6 +8,8 @@ from server.dependencies import CurrentUser
 from server.models import RequestModel, ResponseModel
 from server.request import APIRequest
 
+from .dispatcher import notify_pending, notify_progress
+
 
 class SendRequestModel(RequestModel):
     ids: list[int] = Field(
@@ -45,110 +47,149 @@ class SendResponseModel(ResponseModel):
 
 
 async def send_to(
-    id_asset: int,
+    ids: list[int],
     id_action: int,
     params: dict[str, Any],
     user: nebula.User,
     priority: int = 3,
     restart_existing: bool = True,
     restart_running: bool = False,
-) -> int | None:
-    """Create or restart a job for a given asset and action ID.
+) -> list[int | None]:
+    """Create or restart jobs for the given assets and action ID.
+
+    All jobs are created or restarted using a single statement.
+    An existing job with the same asset, action and settings is restarted
+    (if requested), otherwise a new job is created. Pending jobs and,
+    unless `restart_running` is set, running jobs are not restarted.
 
-    Returns ID of the job created/restarted or None if no job was created.
+    Returns IDs of the jobs created/restarted in the order of the given
+    assets. None is returned for assets for which no job was created
+    (including assets which do not exist).
     """
-    res = await nebula.db.fetch("SELECT id FROM actions WHERE id = $1", id_action)
+    res = await nebula.db.fetch(
+        "SELECT service_type FROM actions WHERE id = $1", id_action
+    )
     if not res:
         raise nebula.NotFoundException("No such action")
 
-    query = "SELECT id FROM jobs WHERE id_asset=$1 AND id_action=$2 AND settings=$3"
-    res = await nebula.db.fetch(query, id_asset, id_action, params)
-    if res:
-        # job exists
-        if not restart_existing:
-            # job exists, but not restarting
-            nebula.log.trace(
-                f"{user} requested sending {id_asset} to {id_action} "
-                " but the job already exists. skipping"
-            )
-            return None
+    asset_ids = list(dict.fromkeys(ids))
+    if not asset_ids:
+        return []
 
-        conds = "0,5"
-        if not restart_running:
-            conds += ",1"
+    keep_statuses = [0, 5] if restart_running else [0, 5, 1]
 
-        query = f"""
+    query = """
+        WITH input AS (
+            SELECT t.id_asset, t.ord
+            FROM unnest($1::INTEGER[]) WITH ORDINALITY AS t(id_asset, ord)
+            JOIN assets AS a ON a.id = t.id_asset
+        ),
+        existing AS (
+            SELECT DISTINCT ON (j.id_asset) j.id_asset, j.id, j.status
+            FROM jobs AS j
+            JOIN input AS i ON i.id_asset = j.id_asset
+            WHERE j.id_action = $2 AND j.settings = $3
+            ORDER BY j.id_asset, j.id
+        ),
+        restarted AS (
             UPDATE jobs SET
-                id_user=$1,
-                id_service=NULL,
-                message='Restart requested',
-                status=5,
-                retries=0,
-                creation_time=$2,
-                start_time=NULL,
-                end_time=NULL
-            WHERE id=$3
-                AND status NOT IN ({conds})
-            RETURNING id
-        """
-
-        result = await nebula.db.fetch(query, user.id, time.time(), res[0]["id"])
-
-        id_job: int | None = None
-
-        if result:
-            id_job = result[0]["id"]
-            await nebula.msg(
-                "job_progress",
-                id=id_job,
-                id_asset=id_asset,
-                id_action=id_action,
-                progress=0,
+                id_user = $4,
+                id_service = NULL,
+                message = 'Restart requested',
+                status = 5,
+                retries = 0,
+                creation_time = $6,
+                start_time = NULL,
+                end_time = NULL
+            FROM existing AS e
+            WHERE jobs.id = e.id
+                AND $7::BOOLEAN
+                AND NOT e.status = ANY($8::INTEGER[])
+            RETURNING jobs.id, jobs.id_asset
+        ),
+        created AS (
+            INSERT INTO jobs (
+                id_asset,
+                id_action,
+                id_user,
+                settings,
+                priority,
+                message,
+                creation_time
             )
-            nebula.log.info(f"{user} restarted job {id_job}")
-            return id_job
-
-        nebula.log.warning(f"Unable to restart job {id_job}")
-        return id_job
-
-    query = """
-        INSERT INTO jobs (
-            id_asset,
-            id_action,
-            id_user,
-            settings,
-            priority,
-            message,
-            creation_time
-        ) VALUES (
-            $1,
-            $2,
-            $3,
-            $4,
-            $5,
-            'Pending',
-            $6
+            SELECT i.id_asset, $2, $4, $3, $5, 'Pending', $6
+            FROM input AS i
+            WHERE NOT EXISTS (SELECT 1 FROM existing AS e WHERE e.id_asset = i.id_asset)
+            ORDER BY i.ord
+            RETURNING id, id_asset
         )
-        RETURNING id
+        SELECT
+            i.id_asset,
+            COALESCE(r.id, c.id) AS id,
+            c.id IS NOT NULL AS created
+        FROM input AS i
+        LEFT JOIN restarted AS r ON r.id_asset = i.id_asset
+        LEFT JOIN created AS c ON c.id_asset = i.id_asset
+        ORDER BY i.ord
     """
 
-    res = await nebula.db.fetch(
-        query, id_asset, id_action, user.id, params, priority, time.time()
+    rows = await nebula.db.fetch(
+        query,
+        asset_ids,
+        id_action,
+        params,
+        user.id,
+        priority,
+        time.time(),
+        restart_existing,
+        keep_statuses,
     )
 
-    if res:
-        id_job = res[0]["id"]
+    jobs: dict[int, int | None] = {}
+    created: list[int] = []
+    restarted: list[int] = []
+    for row in rows:
+        jobs[row["id_asset"]] = row["id"]
+        if row["id"] is None:
+            continue
+        if row["created"]:
+            created.append(row["id"])
+        else:
+            restarted.append(row["id"])
+
+    if missing := len(asset_ids) - len(rows):
+        nebula.log.warn(f"{user} requested sending {missing} non-existent assets")
+
+    if skipped := len(rows) - len(created) - len(restarted):
+        nebula.log.trace(
+            f"{user} requested sending {skipped} assets to {id_action}, "
+            "but their jobs already exist or are running. skipping"
+        )
+
+    if created or restarted:
         await nebula.msg(
-            "job_progress",
-            id=id_job,
-            id_asset=id_asset,
+            "jobs_created",
             id_action=id_action,
-            progress=0,
-            message="Job created",
+            created=created,
+            restarted=restarted,
+        )
+        await notify_progress(
+            [
+                {
+                    "id": id_job,
+                    "status": 5,
+                    "progress": 0,
+                    "message": "Restart requested",
+                }
+                for id_job in restarted
+            ]
+        )
+        nebula.log.info(
+            f"{user} created {len(created)} and restarted {len(restarted)} jobs"
         )
-        nebula.log.info(f"{user} created a new job {id_job}")
-        return id_job
-    return None
+        await notify_pending([res[0]["service_type"]])
+
+    return [jobs.get(id_asset) for id_asset in ids]
 
 
 class SendRequest(APIRequest):
@@ -167,21 +208,16 @@ class SendRequest(APIRequest):
             raise nebula.ForbiddenException()
 
         nebula.log.info(
-            f"Starting action {request.id_action} "
-            f"for assets {', '.join([str(id) for id in request.ids])}"
+            f"Starting action {request.id_action} for {len(request.ids)} assets"
         )
 
-        result: list[int | None] = []
-        for id_asset in request.ids:
-            id_job = await send_to(
-                id_asset=id_asset,
-                id_action=request.id_action,
-                params=request.params,
-                user=user,
-                priority=request.priority,
-                restart_existing=request.restart_existing,
-                restart_running=request.restart_running,
-            )
-            result.append(id_job)
-
+        result = await send_to(
+            request.ids,
+            id_action=request.id_action,
+            params=request.params,
+            user=user,
+            priority=request.priority,
+            restart_existing=request.restart_existing,
+            restart_running=request.restart_running,
+        )
         return SendResponseModel(ids=result)
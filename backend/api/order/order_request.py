@@ -1,5 +1,5 @@
 import nebula
-from nebula.helpers.scheduling import bin_refresh
+from nebula.helpers.scheduling import enqueue_bin_refresh
 from server.dependencies import CurrentUser, RequestInitiator
 from server.request import APIRequest
 
@@ -27,5 +27,5 @@ class OrderRequest(APIRequest):
         nebula.log.info(f"Changed order in bins {result.affected_bins}", user=user.name)
 
         # Update bin duration
-        await bin_refresh(result.affected_bins, initiator=initiator, user=user)
+        await enqueue_bin_refresh(result.affected_bins, initiator=initiator, user=user)
         return result
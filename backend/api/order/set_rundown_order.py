@@ -16,6 +16,7 @@ async def set_rundown_order(
     order = request.order
 
     affected_bins: list[int] = [id_bin]
+    changed_items: list[nebula.Item] = []
     pos = 1
 
     pool = await nebula.db.pool()
@@ -102,10 +103,12 @@ async def set_rundown_order(
                 item["position"] = pos
                 item["id_bin"] = id_bin
 
-                # save item, but don't send a notification just yet.
-                # we'll send one notification for all items in the bin
                 item["updated_by"] = user.id
-                await item.save(notify=False)
+                changed_items.append(item)
             pos += 1
 
+        # Save all changed items at once, but don't send a notification.
+        # bin_refresh sends one notification for all affected bins
+        await nebula.Item.save_many(changed_items, connection=conn, notify=False)
+
     return OrderResponseModel(affected_bins=affected_bins)
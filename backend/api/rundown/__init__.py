@@ -1,3 +1,4 @@
-__all__ = ["RundownRequest"]
+__all__ = ["RundownRequest", "RundownsRequest"]
 
 from .rundown_request import RundownRequest
+from .rundowns_request import RundownsRequest
@@ -1,34 +1,231 @@
+import datetime
 import time
+from typing import TYPE_CHECKING
 
 import nebula
-from nebula.enum import ObjectStatus, RunMode
-from nebula.helpers.scheduling import get_pending_assets, parse_rundown_date
+from nebula.common import hash_data
+from nebula.helpers.scheduling import get_pending_assets_by_action, parse_rundown_date
 
-from .models import RundownResponseModel, RundownRow
+from .models import (
+    RundownDay,
+    RundownResponseModel,
+    RundownRow,
+    RundownsResponseModel,
+)
+from .records import RundownRecord, build_rows
+from .rundown_cache import CachedRundown, RundownKey, get_asrun_tokens, rundown_cache
+from .timing import compute_timing
 
+if TYPE_CHECKING:
+    from nebula.settings.models import PlayoutChannelSettings
 
-async def get_rundown(id_channel: int, date: str | None = None) -> RundownResponseModel:
-    """Get a rundown"""
+# Rundown rows and start times of the latest runs of the items
+BuiltRundown = tuple[list[RundownRow], dict[int, float]]
+
+
+def get_channel(id_channel: int) -> "PlayoutChannelSettings":
     if not (channel := nebula.settings.get_playout_channel(id_channel)):
         raise nebula.BadRequestException(f"No such channel: {id_channel}")
+    return channel
 
+
+async def get_rundown(id_channel: int, date: str | None = None) -> RundownResponseModel:
+    """Get a rundown"""
+    channel = get_channel(id_channel)
     request_start_time = time.monotonic()
     start_time = parse_rundown_date(date, channel)
-    end_time = start_time + (3600 * 24)
-    pending_assets = await get_pending_assets(channel.send_action)
-    pskey = f"playout_status/{id_channel}"
 
+    rundowns, built = await load_rundowns([(channel, start_time)])
+    cached = rundowns[(id_channel, start_time)]
+    msg = "Rundown generated" if built else "Rundown loaded from cache"
+
+    send_actions = [channel.send_action] if channel.send_action else []
+    pending_assets = await get_pending_assets_by_action(send_actions)
+    rows, generation = apply_transfer_progress(
+        cached, pending_assets.get(channel.send_action or 0, set())
+    )
+
+    elapsed = time.monotonic() - request_start_time
+    return RundownResponseModel(
+        rows=rows,
+        generation=generation,
+        detail=f"{msg} in {elapsed:.3f} seconds",
+    )
+
+
+async def get_rundowns(
+    id_channels: list[int],
+    date: str | None = None,
+    days: int = 1,
+) -> RundownsResponseModel:
+    """Get rundowns of multiple channels and days"""
+    channels = [get_channel(id_channel) for id_channel in id_channels]
+    request_start_time = time.monotonic()
+
+    first_day = datetime.date.fromisoformat(date) if date else datetime.date.today()
+    dates = [
+        (first_day + datetime.timedelta(days=i)).strftime("%Y-%m-%d")
+        for i in range(days)
+    ]
+    ranges = [
+        (channel, parse_rundown_date(day, channel))
+        for channel in channels
+        for day in dates
+    ]
+
+    rundowns, built = await load_rundowns(ranges)
+
+    # Pending transfers are loaded once for all channels
+
+    send_actions = sorted({c.send_action for c in channels if c.send_action})
+    pending_assets = await get_pending_assets_by_action(send_actions)
+
+    result: list[RundownDay] = []
+    for (channel, start_time), day in zip(ranges, dates * len(channels), strict=True):
+        cached = rundowns[(channel.id, start_time)]
+        rows, generation = apply_transfer_progress(
+            cached, pending_assets.get(channel.send_action or 0, set())
+        )
+        result.append(
+            RundownDay(
+                id_channel=channel.id,
+                date=day,
+                start_time=start_time,
+                rows=rows,
+                generation=generation,
+            )
+        )
+
+    elapsed = time.monotonic() - request_start_time
+    return RundownsResponseModel(
+        rundowns=result,
+        detail=f"{len(result)} rundowns loaded ({built} generated) "
+        f"in {elapsed:.3f} seconds",
+    )
+
+
+async def load_rundowns(
+    ranges: list[tuple["PlayoutChannelSettings", int]],
+) -> tuple[dict[RundownKey, CachedRundown], int]:
+    """Return rundowns of the given channels and day starts.
+
+    Valid rundowns are taken from the cache. The missing ones are built
+    using a single query and stored in the cache. Return the rundowns
+    and the number of built ones.
+    """
+    tokens = await get_asrun_tokens(sorted({channel.id for channel, _ in ranges}))
+
+    result: dict[RundownKey, CachedRundown] = {}
+    missing: list[tuple[PlayoutChannelSettings, int]] = []
+    for channel, start_time in ranges:
+        key = (channel.id, start_time)
+        cached = await rundown_cache.get(channel.id, start_time, tokens[channel.id])
+        if cached is None:
+            missing.append((channel, start_time))
+        else:
+            result[key] = cached
+
+    if not missing:
+        return result, 0
+
+    versions = {
+        (channel.id, start_time): await rundown_cache.version((channel.id, start_time))
+        for channel, start_time in missing
+    }
+    built = await build_rundowns(
+        [
+            (channel, start_time, start_time + (3600 * 24))
+            for channel, start_time in missing
+        ]
+    )
+
+    for channel, start_time in missing:
+        key = (channel.id, start_time)
+        rows, asrun_starts = built.get(key, ([], {}))
+        cached = CachedRundown(
+            id_channel=channel.id,
+            start_time=start_time,
+            end_time=start_time + (3600 * 24),
+            asrun_token=tokens[channel.id],
+            asrun_starts=asrun_starts,
+            event_exits=compute_timing(rows, asrun_starts),
+            rows=rows,
+        )
+        await rundown_cache.store(cached, versions[key])
+        result[key] = cached
+
+    return result, len(missing)
+
+
+def apply_transfer_progress(
+    cached: CachedRundown,
+    pending_assets: set[int],
+) -> tuple[list[RundownRow], str]:
+    """Return rows and generation of a rundown with transfer progress applied.
+
+    Transfer progress is not cached. Rows of assets which are being
+    sent to the playout storage are replaced by updated copies.
+    """
+    rows = cached.rows
+    generation = cached.generation
+    if pending_rows := {
+        row.id for row in rows if row.type == "item" and row.id_asset in pending_assets
+    }:
+        rows = [
+            row.model_copy(update={"transfer_progress": -1})
+            if row.type == "item" and row.id in pending_rows
+            else row
+            for row in rows
+        ]
+        generation += "-" + hash_data(sorted(pending_rows))[:8]
+    return rows, generation
+
+
+async def build_rundown(
+    channel: "PlayoutChannelSettings",
+    start_time: int,
+    end_time: int,
+    id_events: list[int] | None = None,
+) -> BuiltRundown:
+    """Build rundown rows of the given channel and time range
+
+    Optionally, only rows of the given events are built.
+    Times of the rows are not computed (see the timing module).
+    Return the rows and start times of the latest runs of the items.
+    """
+    built = await build_rundowns([(channel, start_time, end_time)], id_events)
+    return built.get((channel.id, start_time), ([], {}))
+
+
+async def build_rundowns(
+    ranges: list[tuple["PlayoutChannelSettings", int, int]],
+    id_events: list[int] | None = None,
+) -> dict[RundownKey, BuiltRundown]:
+    """Build rundowns of multiple channels and time ranges in one query
+
+    Result is keyed by channel ID and start time of the range.
+    Ranges without events are not included.
+    """
+    channels = {channel.id: channel for channel, _, _ in ranges}
     query = """
         SELECT
+            r.id_channel,
+            r.start_time,
             e.id AS id_event,
             e.meta AS emeta,
             e.id_magic AS id_bin,
             i.id AS id_item,
             i.meta AS imeta,
             a.meta AS ameta,
-            ar.latest_start AS as_start,
-            ar.latest_stop AS as_stop
-        FROM events AS e
+            ar.start AS as_start,
+            ar.stop AS as_stop
+        FROM unnest($1::INTEGER[], $2::INTEGER[], $3::INTEGER[])
+            AS r(id_channel, start_time, end_time)
+
+        JOIN events AS e
+        ON e.id_channel = r.id_channel
+        AND e.start >= r.start_time
+        AND e.start < r.end_time
 
         LEFT JOIN items AS i
         ON e.id_magic = i.id_bin
@@ -36,195 +233,31 @@ async def get_rundown(id_channel: int, date: str | None = None) -> RundownRespon
         LEFT JOIN assets AS a
         ON i.id_asset = a.id
 
-        LEFT JOIN (
-            SELECT
-                id_item,
-                start AS latest_start,
-                stop AS latest_stop
-                FROM (
-                    SELECT
-                        id_item,
-                        start,
-                        stop,
-                        ROW_NUMBER() OVER
-                            (PARTITION BY id_item ORDER BY start DESC) AS rn
-                    FROM asrun
-                    WHERE
-                        id_channel = $1
-                    AND start >= $2 - 604800
-                    AND start < $3 + 604800
-                ) AS ranked
-                WHERE rn = 1
-        ) AS ar
-
-        ON i.id = ar.id_item
-
-        WHERE
-            e.id_channel = $1
-        AND e.start >= $2
-        AND e.start < $3
+        LEFT JOIN asrun_latest AS ar
+        ON i.id = ar.id_item AND ar.id_channel = e.id_channel
+
+        WHERE $4::INTEGER[] IS NULL OR e.id = ANY($4)
 
         ORDER BY
+            r.id_channel ASC,
+            r.start_time ASC,
             e.start ASC,
             i.position ASC,
             i.id ASC
     """
 
-    rows: list[RundownRow] = []
-
-    last_event = None
-    ts_broadcast = ts_scheduled = 0.0
-
-    async for record in nebula.db.iterate(query, id_channel, start_time, end_time):
-        id_event = record["id_event"]
-        id_item = record["id_item"]
-        id_bin = record["id_bin"]
-        emeta = record["emeta"] or {}
-        imeta = record["imeta"] or {}
-        ameta = record["ameta"] or {}
-
-        event = nebula.Event.from_meta(emeta)
-        item = nebula.Item.from_meta(imeta)
-        if ameta:
-            asset = nebula.Asset.from_meta(ameta)
-            item.asset = asset
-        else:
-            asset = None
-
-        if (last_event is None) or (id_event != last_event.id):
-            row = RundownRow(
-                id=id_event,
-                type="event",
-                row_number=len(rows),
-                scheduled_time=event["start"],
-                broadcast_time=event["start"],
-                run_mode=event.get("run_mode", RunMode.RUN_AUTO),
-                title=event.get("title"),
-                subtitle=event.get("subtitle"),
-                id_asset=event.get("id_asset"),
-                id_bin=id_bin,
-                id_event=id_event,
-                meta=emeta,
-            )
-
-            ts_scheduled = row.scheduled_time
-            if last_event is None:
-                ts_broadcast = event["start"]
-
-            if last_event and (not last_event.duration):
-                ts_broadcast = event["start"]
-
-            if emeta.get("run_mode", 0):
-                ts_broadcast = event["start"]
-
-            last_event = row
-            rows.append(row)
-
-        if id_item is None:
-            # TODO: append empty row?
-            continue
-
-        airstatus: ObjectStatus | None = None
-
-        if (as_start := record["as_start"]) is not None:
-            if as_start > ts_broadcast:
-                ts_broadcast = as_start
-            as_stop = record["as_stop"]
-            airstatus = ObjectStatus.AIRED if as_stop else ObjectStatus.ONAIR
-
-        # TODO
-        # if rundown_event_asset:
-        #     item.meta["rundown_event_asset"] = rundown_event_asset
-
-        # Row status
-
-        istatus: ObjectStatus
-        if not ameta:
-            # virtual item. consider it online
-            istatus = ObjectStatus.ONLINE
-        elif ameta.get("status") == ObjectStatus.OFFLINE:
-            # media is not on the production storage
-            istatus = ObjectStatus.OFFLINE
-        elif pskey not in ameta or ameta[pskey]["status"] == ObjectStatus.OFFLINE:
-            # media is not on the playout storage
-            istatus = ObjectStatus.REMOTE
-        elif ameta[pskey]["status"] == ObjectStatus.CORRUPTED:
-            # media is on the playout storage but corrupted
-            istatus = ObjectStatus.CORRUPTED
-        elif ameta[pskey]["status"] == ObjectStatus.ONLINE:
-            istatus = airstatus if airstatus is not None else ObjectStatus.ONLINE
-        else:
-            istatus = ObjectStatus.UNKNOWN
-
-        transfer_progress = -1 if asset and asset.id in pending_assets else None
-
-        # duration, mark_in, mark_out = parse_durations(ameta, imeta)
-        duration = item.duration
-        mark_in = item.meta.get("mark_in")
-        mark_out = item.meta.get("mark_out")
-
-        # Append item to the result
-
-        meta = {}
-        if asset:
-            for key in channel.rundown_columns:
-                if (key in asset.meta) and (
-                    key
-                    not in [
-                        "title",
-                        "subtitle",
-                        "id_asset",
-                        "duration",
-                        "status",
-                        "mark_in",
-                        "mark_out",
-                    ]
-                ):
-                    meta[key] = asset.meta[key]
-
-        id_asset = imeta.get("id_asset")
-        primary = bool(event.get("id_asset") and (event["id_asset"] == id_asset))
-        row = RundownRow(
-            id=id_item,
-            row_number=len(rows),
-            type="item",
-            scheduled_time=ts_scheduled,
-            broadcast_time=ts_broadcast,
-            run_mode=imeta.get("run_mode"),
-            loop=imeta.get("loop"),
-            item_role=imeta.get("item_role"),
-            title=item["title"],
-            subtitle=item["subtitle"],
-            note=item["note"] or None,
-            id_asset=id_asset,
-            id_bin=id_bin,
-            id_event=id_event,
-            id_folder=asset["id_folder"] if asset else None,
-            duration=duration,
-            status=istatus,
-            transfer_progress=transfer_progress,
-            asset_mtime=ameta.get("mtime", 0),
-            mark_in=mark_in,
-            mark_out=mark_out,
-            is_empty=False,
-            is_primary=primary,
-            meta=meta,
-        )
-
-        rows.append(row)
-
-        # Update timestamps
-
-        if row.run_mode != RunMode.RUN_SKIP:
-            if not last_event.duration:
-                last_event.broadcast_time = ts_broadcast
-            ts_scheduled += duration
-            if row.item_role not in ["placeholder", "lead_in", "lead_out"]:
-                ts_broadcast += duration
-            last_event.duration += duration
-            last_event.is_empty = False
-
-    elapsed = time.monotonic() - request_start_time
-    msg = f"Rundown generated in {elapsed:.3f} seconds"
-
-    return RundownResponseModel(rows=rows, detail=msg)
+    records: dict[RundownKey, list[RundownRecord]] = {}
+    async for record in nebula.db.iterate(
+        query,
+        [channel.id for channel, _, _ in ranges],
+        [start_time for _, start_time, _ in ranges],
+        [end_time for _, _, end_time in ranges],
+        id_events,
+    ):
+        key = (record["id_channel"], record["start_time"])
+        records.setdefault(key, []).append(RundownRecord(record))
+
+    return {
+        key: build_rows(channels[key[0]], key_records)
+        for key, key_records in records.items()
+    }
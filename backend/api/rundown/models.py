@@ -44,4 +44,44 @@ class RundownRow(ResponseModel):
 
 class RundownResponseModel(ResponseModel):
     rows: list[RundownRow] = Field(default_factory=list)
+    generation: str | None = Field(
+        None,
+        title="Generation",
+        description="Identifier of the rundown version. It is also sent "
+        "as an ETag, so unchanged rundowns may be requested with "
+        "If-None-Match header.",
+    )
+    detail: str | None = Field(None)
+
+
+class RundownsRequestModel(RequestModel):
+    channels: list[int] = Field(
+        ...,
+        title="Channels",
+        description="List of channel IDs",
+        min_length=1,
+        examples=[[1, 2]],
+    )
+    date: str | None = Field(
+        None,
+        pattern=r"\d{4}-\d{2}-\d{2}",
+        title="Date",
+        description="First day of the range. Today is used if not specified",
+    )
+    days: int = Field(1, ge=1, le=14, title="Number of days")
+
+
+class RundownDay(ResponseModel):
+    id_channel: int = Field(...)
+    date: str = Field(...)
+    start_time: int = Field(..., description="Start of the rundown day")
+    rows: list[RundownRow] = Field(default_factory=list)
+    generation: str | None = Field(None)
+
+
+class RundownsResponseModel(ResponseModel):
+    rundowns: list[RundownDay] = Field(
+        default_factory=list,
+        description="Rundowns grouped by channel and day",
+    )
     detail: str | None = Field(None)
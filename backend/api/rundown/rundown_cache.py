@@ -0,0 +1,294 @@
+"""Cache of rundowns per channel and day.
+
+Rundowns are stored in Redis, so they are shared between the server
+workers, and kept in the process memory. Each stored rundown gets a new
+generation from a counter shared by all workers. The generation of the
+current rundown of each day is stored in Redis as well, so a worker uses
+its in-memory copy only while the generation matches, and otherwise
+loads the shared one. The generation is also used as the ETag.
+
+Changes of objects are applied to cached rundowns by the updates module
+(by a single worker per change). Additionally, a cached rundown
+is invalidated when:
+
+- a new as-run record is created or closed on the channel
+  (checked when a current rundown is requested)
+- it is older than the TTL (changes saved without a notification)
+
+Transfer progress of pending assets is not cached.
+It is applied to the cached rows when a rundown is served.
+"""
+
+import datetime
+import time
+from typing import TYPE_CHECKING
+
+from pydantic import BaseModel, Field, ValidationError
+
+import nebula
+from nebula.common import json_dumpb
+from nebula.helpers.scheduling import parse_rundown_date
+
+from .models import RundownRow
+
+if TYPE_CHECKING:
+    from nebula.settings.models import PlayoutChannelSettings
+
+REDIS_NAMESPACE = "rundown-cache"
+
+RundownKey = tuple[int, int]
+
+# Store a rundown (KEYS[2]) and its generation (KEYS[1]) only if the current
+# generation is the expected version (ARGV[1]). Return 1 if stored.
+STORE_SCRIPT = """
+if (redis.call('GET', KEYS[1]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[4])
+redis.call('SET', KEYS[1], ARGV[3], 'EX', ARGV[4])
+return 1
+"""
+
+
+class CachedRundown(BaseModel):
+    id_channel: int = Field(...)
+    start_time: int = Field(...)
+    end_time: int = Field(...)
+    generation: str = Field("")
+    created_at: float = Field(default_factory=time.time)
+    asrun_token: str | None = Field(None)
+    asrun_starts: dict[int, float] = Field(default_factory=dict)
+    event_exits: list[float] = Field(default_factory=list)
+    rows: list[RundownRow] = Field(default_factory=list)
+
+    @property
+    def key(self) -> RundownKey:
+        return self.id_channel, self.start_time
+
+
+class RundownDependencies:
+    """IDs of objects a cached rundown was built from"""
+
+    def __init__(self, rows: list[RundownRow]) -> None:
+        self.events: set[int] = set()
+        self.bins: set[int] = set()
+        self.items: set[int] = set()
+        self.assets: set[int] = set()
+        for row in rows:
+            self.events.add(row.id_event)
+            self.bins.add(row.id_bin)
+            if row.type == "item":
+                self.items.add(row.id)
+            if row.id_asset:
+                self.assets.add(row.id_asset)
+
+    def get(self, object_type: str) -> set[int]:
+        match object_type:
+            case "event":
+                return self.events
+            case "bin":
+                return self.bins
+            case "item":
+                return self.items
+            case "asset":
+                return self.assets
+        return set()
+
+
+def get_day_start(timestamp: float, channel: "PlayoutChannelSettings") -> int:
+    """Return the start of the rundown day the given timestamp belongs to"""
+    hh, mm = channel.day_start
+    dt = datetime.datetime.fromtimestamp(timestamp)
+    date = (dt - datetime.timedelta(hours=hh, minutes=mm)).strftime("%Y-%m-%d")
+    return parse_rundown_date(date, channel)
+
+
+async def get_asrun_tokens(id_channels: list[int]) -> dict[int, str]:
+    """Return tokens which change with every new or closed as-run record"""
+    query = """
+        SELECT c.id_channel, a.id, a.stop
+        FROM unnest($1::INTEGER[]) AS c(id_channel)
+        LEFT JOIN LATERAL (
+            SELECT id, stop FROM asrun
+            WHERE id_channel = c.id_channel
+            ORDER BY id DESC LIMIT 1
+        ) AS a ON true
+    """
+    result: dict[int, str] = {}
+    for row in await nebula.db.fetch(query, id_channels):
+        if row["id"] is None:
+            result[row["id_channel"]] = "0"
+        else:
+            result[row["id_channel"]] = f"{row['id']}:{row['stop']}"
+    return result
+
+
+async def get_asrun_token(id_channel: int) -> str:
+    """Return a token which changes with every new or closed as-run record"""
+    tokens = await get_asrun_tokens([id_channel])
+    return tokens[id_channel]
+
+
+class RundownCache:
+    ttl: int = 600
+
+    # How long a change is claimed by the worker applying it (in seconds)
+    claim_ttl: int = 60
+
+    # As-run records are validated for rundowns in this range
+    # around the current time (in seconds)
+    live_margin: int = 3600 * 6
+
+    def __init__(self) -> None:
+        self.entries: dict[RundownKey, CachedRundown] = {}
+        self.dependencies: dict[RundownKey, RundownDependencies] = {}
+
+    def is_live(self, entry: CachedRundown) -> bool:
+        now = time.time()
+        return (
+            entry.start_time - self.live_margin
+            <= now
+            < entry.end_time + self.live_margin
+        )
+
+    def _add(self, entry: CachedRundown) -> None:
+        self.entries[entry.key] = entry
+        self.dependencies[entry.key] = RundownDependencies(entry.rows)
+
+    def _remove(self, key: RundownKey) -> None:
+        self.entries.pop(key, None)
+        self.dependencies.pop(key, None)
+
+    async def version(self, key: RundownKey) -> str:
+        """Return the current generation of the given key.
+
+        Pass it to `store` to prevent storing a rundown which
+        was changed or invalidated while it was being built.
+        """
+        value = await nebula.redis.get(REDIS_NAMESPACE, generation_key(key))
+        if isinstance(value, bytes):
+            return value.decode("ascii")
+        return value or ""
+
+    async def load(self, key: RundownKey) -> CachedRundown | None:
+        """Return the current shared rundown of the given key (if any)"""
+        current = await self.version(key)
+        if not current or current.startswith("!"):
+            self._remove(key)
+            return None
+
+        entry = self.entries.get(key)
+        if entry is not None and entry.generation == current:
+            return entry
+
+        self._remove(key)
+        try:
+            data = await nebula.redis.get_json(REDIS_NAMESPACE, redis_key(key))
+            entry = CachedRundown.model_validate(data)
+        except (KeyError, ValueError, ValidationError):
+            return None
+        if entry.generation != current:
+            return None
+        self._add(entry)
+        return entry
+
+    async def get(
+        self,
+        id_channel: int,
+        start_time: int,
+        asrun_token: str | None = None,
+    ) -> CachedRundown | None:
+        """Return a cached rundown if it is still valid.
+
+        Current as-run token of the channel may be provided
+        when it is already known. Otherwise it is loaded if needed.
+        """
+        key = (id_channel, start_time)
+        if (entry := await self.load(key)) is None:
+            return None
+
+        if time.time() - entry.created_at > self.ttl:
+            await self.invalidate({key})
+            return None
+
+        if self.is_live(entry):
+            if asrun_token is None:
+                asrun_token = await get_asrun_token(id_channel)
+            if entry.asrun_token != asrun_token:
+                await self.invalidate({key})
+                return None
+
+        return entry
+
+    async def store(self, entry: CachedRundown, version: str) -> bool:
+        """Assign a new generation to a rundown and store it.
+
+        The rundown is not stored if the current generation
+        is not the given version anymore. The check and the writes
+        are atomic, so a concurrent invalidation is never overwritten.
+        Return True if stored.
+        """
+        generation = await nebula.redis.incr(REDIS_NAMESPACE, "generation")
+        entry.generation = str(generation)
+        # The generation and creation time must be shared as well,
+        # so the model is dumped including the default values
+        stored = await nebula.redis.eval(
+            STORE_SCRIPT,
+            REDIS_NAMESPACE,
+            [generation_key(entry.key), redis_key(entry.key)],
+            version,
+            json_dumpb(entry.model_dump(mode="json", exclude_none=True)),
+            entry.generation,
+            self.ttl,
+        )
+        if not stored:
+            return False
+        self._add(entry)
+        return True
+
+    async def claim(self, key: RundownKey, token: str) -> bool:
+        """Claim applying a change to a cached rundown.
+
+        All workers receive the same change notifications.
+        Only the worker which claims the change first applies it.
+        """
+        return await nebula.redis.set_nx(
+            REDIS_NAMESPACE,
+            f"{redis_key(key)}-claim-{token}",
+            "1",
+            ttl=self.claim_ttl,
+        )
+
+    async def claim_change(self, token: str) -> bool:
+        """Claim looking up rundowns affected by a change"""
+        return await nebula.redis.set_nx(
+            REDIS_NAMESPACE,
+            f"change-claim-{token}",
+            "1",
+            ttl=self.claim_ttl,
+        )
+
+    async def invalidate(self, keys: set[RundownKey]) -> None:
+        for key in keys:
+            self._remove(key)
+            # Invalidated keys get a new generation as well, so rundowns
+            # built before the invalidation are not stored (see `store`)
+            generation = await nebula.redis.incr(REDIS_NAMESPACE, "generation")
+            await nebula.redis.set(
+                REDIS_NAMESPACE,
+                generation_key(key),
+                f"!{generation}",
+                ttl=self.ttl,
+            )
+            await nebula.redis.delete(REDIS_NAMESPACE, redis_key(key))
+
+
+def redis_key(key: RundownKey) -> str:
+    return f"{key[0]}-{key[1]}"
+
+
+def generation_key(key: RundownKey) -> str:
+    return f"{key[0]}-{key[1]}-generation"
+
+
+rundown_cache = RundownCache()
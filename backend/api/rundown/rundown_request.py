@@ -1,3 +1,5 @@
+from fastapi import Header, HTTPException, Response
+
 import nebula
 from nebula.helpers.coalescer import Coalescer
 from server.dependencies import CurrentUser
@@ -21,6 +23,11 @@ class RundownRequest(APIRequest):
     The date should be specified in the format YYYY-MM-DD, considering the
     channel's start time as configured. If no date is specified, the current
     date is used.
+
+    Rundowns are cached. The response contains a generation identifier,
+    which is also sent as an ETag header. When the rundown did not change
+    since the generation provided in the If-None-Match header, an empty
+    response with the 304 status code is returned.
     """
 
     name = "rundown"
@@ -31,10 +38,17 @@ class RundownRequest(APIRequest):
         self,
         request: RundownRequestModel,
         user: CurrentUser,
+        response: Response,
+        if_none_match: str | None = Header(None),
     ) -> RundownResponseModel:
         if not user.can("rundown_view", request.id_channel):
             raise nebula.ForbiddenException("You are not allowed to view this rundown")
 
         coalesce = Coalescer()
         rundown = await coalesce(get_rundown, request.id_channel, request.date)
+
+        etag = f'"{rundown.generation}"'
+        if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+            raise HTTPException(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
         return rundown
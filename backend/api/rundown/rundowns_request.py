@@ -0,0 +1,40 @@
+import nebula
+from nebula.helpers.coalescer import Coalescer
+from server.dependencies import CurrentUser
+from server.request import APIRequest
+
+from .get_rundown import get_rundowns
+from .models import RundownsRequestModel, RundownsResponseModel
+
+
+class RundownsRequest(APIRequest):
+    """Retrieve rundowns of multiple channels and days.
+
+    This is useful for overviews displaying several channels at once.
+    Rundowns which are not cached are built together using a single
+    database query, and pending transfers are resolved once for all
+    channels.
+
+    Rundowns are returned grouped by channel and day, in the order of
+    the requested channels. Each of them has the same format as the
+    result of the `rundown` request.
+    """
+
+    name = "rundowns"
+    title = "Get rundowns"
+    response_model = RundownsResponseModel
+
+    async def handle(
+        self,
+        request: RundownsRequestModel,
+        user: CurrentUser,
+    ) -> RundownsResponseModel:
+        id_channels = list(dict.fromkeys(request.channels))
+        for id_channel in id_channels:
+            if not user.can("rundown_view", id_channel):
+                raise nebula.ForbiddenException(
+                    f"You are not allowed to view rundown of channel {id_channel}"
+                )
+
+        coalesce = Coalescer()
+        return await coalesce(get_rundowns, id_channels, request.date, request.days)
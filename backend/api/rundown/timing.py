@@ -0,0 +1,127 @@
+"""Rundown timing engine.
+
+Rundown rows are split into event blocks (an event row followed by its
+items). Scheduled and broadcast times of a block depend only on its own
+rows, as-run records of its items and on the broadcast time at which
+the previous block ended (its exit time). Exit times of all blocks are
+kept along with the rundown, so when a block changes, only that block
+and the following ones are recomputed. Propagation stops at the first
+block which starts at a fixed time (event with a run mode set) or which
+is not affected by the change.
+"""
+
+from nebula.enum import RunMode
+
+from .models import RundownRow
+
+# Item roles which do not shift the broadcast time
+NON_TIMING_ROLES = ["placeholder", "lead_in", "lead_out"]
+
+TimingState = tuple[float, float, float, bool]
+
+
+def get_timing_state(row: RundownRow) -> TimingState:
+    return row.scheduled_time, row.broadcast_time, row.duration, row.is_empty
+
+
+def get_event_ranges(rows: list[RundownRow]) -> list[tuple[int, int]]:
+    """Return (start, end) row indices of event blocks"""
+    starts = [i for i, row in enumerate(rows) if row.type == "event"]
+    return list(zip(starts, [*starts[1:], len(rows)], strict=True))
+
+
+def time_event(
+    rows: list[RundownRow],
+    start: int,
+    end: int,
+    ts_broadcast: float,
+    prev_event: RundownRow | None,
+    asrun_starts: dict[int, float],
+) -> float:
+    """Compute times of an event block. Return its exit broadcast time"""
+    event = rows[start]
+
+    # Scheduled time of an event row is its start time
+    ts_scheduled = event.scheduled_time
+    if prev_event is None or not prev_event.duration or event.run_mode:
+        ts_broadcast = event.scheduled_time
+
+    event.broadcast_time = event.scheduled_time
+    event.duration = 0
+    event.is_empty = True
+
+    for row in rows[start + 1 : end]:
+        if (as_start := asrun_starts.get(row.id)) is not None:
+            ts_broadcast = max(ts_broadcast, as_start)
+
+        row.scheduled_time = ts_scheduled
+        row.broadcast_time = ts_broadcast
+
+        if row.run_mode == RunMode.RUN_SKIP:
+            continue
+        if not event.duration:
+            event.broadcast_time = ts_broadcast
+        ts_scheduled += row.duration
+        if row.item_role not in NON_TIMING_ROLES:
+            ts_broadcast += row.duration
+        event.duration += row.duration
+        event.is_empty = False
+
+    return ts_broadcast
+
+
+def compute_timing(
+    rows: list[RundownRow],
+    asrun_starts: dict[int, float],
+) -> list[float]:
+    """Compute times of all rundown rows. Return exit times of event blocks"""
+    exits: list[float] = []
+    ts_broadcast = 0.0
+    prev_event: RundownRow | None = None
+    for start, end in get_event_ranges(rows):
+        ts_broadcast = time_event(
+            rows, start, end, ts_broadcast, prev_event, asrun_starts
+        )
+        exits.append(ts_broadcast)
+        prev_event = rows[start]
+    return exits
+
+
+def update_timing(
+    rows: list[RundownRow],
+    asrun_starts: dict[int, float],
+    exits: list[float],
+    from_event: int,
+) -> list[int]:
+    """Recompute times starting with the event block of the given index.
+
+    Rows of recomputed blocks are replaced by copies in the list,
+    so the original rows may still be referenced elsewhere.
+    `exits` is updated in place. Return indices of rows which
+    timing has changed.
+    """
+    ranges = get_event_ranges(rows)
+    changed: list[int] = []
+    for index in range(from_event, len(ranges)):
+        start, end = ranges[index]
+        if index > from_event and rows[start].run_mode:
+            # Fixed start. Following blocks are not affected
+            break
+
+        old_states = [get_timing_state(row) for row in rows[start:end]]
+        rows[start:end] = [row.model_copy() for row in rows[start:end]]
+
+        ts_broadcast = exits[index - 1] if index else 0.0
+        prev_event = rows[ranges[index - 1][0]] if index else None
+        exit_time = time_event(rows, start, end, ts_broadcast, prev_event, asrun_starts)
+
+        block_changed = False
+        for offset, old_state in enumerate(old_states):
+            if get_timing_state(rows[start + offset]) != old_state:
+                changed.append(start + offset)
+                block_changed = True
+
+        if index > from_event and not block_changed and exit_time == exits[index]:
+            break
+        exits[index] = exit_time
+    return changed
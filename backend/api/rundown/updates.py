@@ -0,0 +1,226 @@
+"""Apply object changes to cached rundowns.
+
+When an event or items of its bin change, rows of the event are rebuilt
+and spliced into the cached rundown. Times are recomputed from that
+event forward only as long as they change (see the timing module).
+Moved events and changes of assets invalidate the affected days.
+
+Changes are applied in the background (see server.rundown_updater), so
+relaying of messages to clients is not delayed. All server workers receive
+the same change notifications, but the days of changed objects are looked
+up and each change of a cached rundown is applied by a single worker,
+which claims it first. The patched rundown is stored with a new generation and a
+`rundown_changed` message with the rebuilt events and compact timing
+updates of the following rows is published, so clients don't need
+to refetch the whole rundown.
+"""
+
+from typing import Any
+
+import nebula
+from nebula.common import hash_data
+
+from .get_rundown import build_rundown
+from .models import RundownRow
+from .rundown_cache import (
+    CachedRundown,
+    RundownKey,
+    get_day_start,
+    rundown_cache,
+)
+from .timing import get_event_ranges, update_timing
+
+
+async def find_events(object_type: str, ids: list[int]) -> list[tuple[int, int, int]]:
+    """Return (id_event, id_channel, day_start) of events, bins or items"""
+    match object_type:
+        case "event":
+            cond = "e.id = ANY($1)"
+        case "bin":
+            cond = "e.id_magic = ANY($1)"
+        case "item":
+            cond = "e.id_magic IN (SELECT id_bin FROM items WHERE id = ANY($1))"
+        case _:
+            return []
+
+    query = f"SELECT e.id, e.id_channel, e.start FROM events AS e WHERE {cond}"
+    result: list[tuple[int, int, int]] = []
+    for row in await nebula.db.fetch(query, ids):
+        if not (channel := nebula.settings.get_playout_channel(row["id_channel"])):
+            continue
+        day_start = get_day_start(row["start"], channel)
+        result.append((row["id"], row["id_channel"], day_start))
+    return result
+
+
+def is_rundown_change(message: dict[str, Any]) -> bool:
+    """Return True if the message may affect cached rundowns"""
+    if message["topic"] != "objects_changed":
+        return False
+    if message["data"].get("object_type") not in ["event", "bin", "item", "asset"]:
+        return False
+    return bool(message["data"].get("objects"))
+
+
+async def apply_changes(message: dict[str, Any]) -> None:
+    """Patch or invalidate cached rundowns affected by a change"""
+    object_type = message["data"]["object_type"]
+    ids = {int(id) for id in message["data"]["objects"]}
+
+    # Message is the same in all workers, so it identifies the change
+    token = hash_data(message)[:16]
+
+    invalidate: set[RundownKey] = set()
+    patches: dict[RundownKey, set[int]] = {}
+
+    # Cached rundowns containing the changed objects
+
+    for key, deps in list(rundown_cache.dependencies.items()):
+        if ids.isdisjoint(deps.get(object_type)):
+            continue
+        if object_type == "asset":
+            invalidate.add(key)
+            continue
+        entry = rundown_cache.entries[key]
+        patches.setdefault(key, set()).update(
+            row.id_event
+            for row in entry.rows
+            if (object_type == "event" and row.id_event in ids)
+            or (object_type == "bin" and row.id_bin in ids)
+            or (object_type == "item" and row.type == "item" and row.id in ids)
+        )
+
+    # New and moved objects are not in the dependencies
+    # of the affected rundowns, so their days are looked up
+    # (by a single worker). This also finds days cached
+    # by other server processes.
+
+    if object_type != "asset" and await rundown_cache.claim_change(token):
+        loaded: dict[RundownKey, CachedRundown | None] = {}
+        for id_event, id_channel, day_start in await find_events(
+            object_type, list(ids)
+        ):
+            key = (id_channel, day_start)
+            if key not in loaded:
+                loaded[key] = await rundown_cache.load(key)
+            cached = rundown_cache.dependencies.get(key)
+            if not cached or id_event not in cached.events:
+                invalidate.add(key)
+            else:
+                patches.setdefault(key, set()).add(id_event)
+
+    if invalidate:
+        nebula.log.trace(f"Invalidating {len(invalidate)} cached rundowns")
+        await rundown_cache.invalidate(invalidate)
+
+    for key, id_events in patches.items():
+        if key not in invalidate:
+            # Workers may find different events of the same rundown
+            # (for example, from an outdated in-memory copy)
+            # and each set of events is applied once
+            await patch_rundown(
+                key, id_events, hash_data([token, sorted(id_events)])[:16]
+            )
+
+
+async def patch_rundown(key: RundownKey, id_events: set[int], token: str) -> None:
+    """Rebuild rows of the given events in a cached rundown"""
+    if not await rundown_cache.claim(key, token):
+        # Another worker applies the change
+        return
+    if (entry := await rundown_cache.load(key)) is None:
+        return
+    if not (channel := nebula.settings.get_playout_channel(entry.id_channel)):
+        return
+
+    version = entry.generation
+    new_rows, new_starts = await build_rundown(
+        channel,
+        entry.start_time,
+        entry.end_time,
+        list(id_events),
+    )
+
+    blocks: dict[int, list[RundownRow]] = {}
+    for row in new_rows:
+        blocks.setdefault(row.id_event, []).append(row)
+    if set(blocks) != id_events:
+        # Event was deleted or moved to another day
+        await rundown_cache.invalidate({key})
+        return
+
+    if any(
+        row.scheduled_time != blocks[row.id][0].scheduled_time
+        for row in entry.rows
+        if row.type == "event" and row.id in blocks
+    ):
+        # Event was moved, so the order of events might have changed
+        await rundown_cache.invalidate({key})
+        return
+
+    # Splice the rebuilt blocks into a copy of the rundown
+
+    rows: list[RundownRow] = []
+    asrun_starts = dict(entry.asrun_starts)
+    for start, end in get_event_ranges(entry.rows):
+        if (id_event := entry.rows[start].id) not in blocks:
+            rows.extend(entry.rows[start:end])
+            continue
+        for row in entry.rows[start + 1 : end]:
+            asrun_starts.pop(row.id, None)
+        rows.extend(blocks[id_event])
+    asrun_starts.update(new_starts)
+
+    for index, row in enumerate(rows):
+        if row.row_number != index:
+            rows[index] = row.model_copy(update={"row_number": index})
+
+    # Recompute times of the rebuilt events and the following ones
+
+    event_exits = list(entry.event_exits)
+    event_indices = [
+        index
+        for index, (start, _) in enumerate(get_event_ranges(rows))
+        if rows[start].id in blocks
+    ]
+    changed: set[int] = set()
+    for event_index in event_indices:
+        changed.update(update_timing(rows, asrun_starts, event_exits, event_index))
+
+    patched = CachedRundown(
+        id_channel=entry.id_channel,
+        start_time=entry.start_time,
+        end_time=entry.end_time,
+        created_at=entry.created_at,
+        asrun_token=entry.asrun_token,
+        asrun_starts=asrun_starts,
+        event_exits=event_exits,
+        rows=rows,
+    )
+    if not await rundown_cache.store(patched, version):
+        # The rundown was changed during the query
+        await rundown_cache.invalidate({key})
+        return
+
+    # Notify clients
+
+    timing = [
+        [row.type, row.id, row.scheduled_time, row.broadcast_time, row.duration]
+        for row in (rows[index] for index in sorted(changed))
+        if row.id_event not in blocks
+    ]
+    await nebula.msg(
+        "rundown_changed",
+        id_channel=patched.id_channel,
+        start_time=patched.start_time,
+        generation=patched.generation,
+        events={
+            str(id_event): [
+                row.model_dump(mode="json", exclude_none=True)
+                for row in rows
+                if row.id_event == id_event
+            ]
+            for id_event in blocks
+        },
+        timing=timing,
+    )
@@ -1,3 +1,4 @@
-__all__ = ["SchedulerRequest"]
+__all__ = ["CloneScheduleRequest", "SchedulerRequest"]
 
+from .clone_request import CloneScheduleRequest
 from .scheduler_request import SchedulerRequest
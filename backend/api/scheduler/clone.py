@@ -0,0 +1,290 @@
+"""Server-side copying of schedule ranges.
+
+Events of a range are duplicated along with their bins, items and
+full-text index using set-based INSERT ... SELECT statements. IDs of the
+new objects are allocated from the table sequences first, so the copies
+can be inserted with a mapping of old and new IDs passed as arrays.
+All statements run in a single transaction.
+"""
+
+import time
+from typing import Literal
+
+import asyncpg
+
+import nebula
+from nebula.enum import ObjectTypeId
+
+from .models import CloneScheduleResponseModel, SchedulerConflictModel
+from .utils import delete_events
+
+CloneMode = Literal["skip", "overwrite"]
+
+
+async def clone_events(
+    conn: asyncpg.pool.PoolConnectionProxy,
+    id_channel: int,
+    start_time: int,
+    end_time: int,
+    target_channel: int,
+    offset: int,
+) -> tuple[list[int], list[int]]:
+    """Copy events of the given range and return new and skipped event IDs.
+
+    A copied event runs from its shifted start until the shifted start
+    of the next source event (the last one until the end of the range).
+    Source events are skipped if the target channel already has an event
+    starting within that time.
+    """
+    now = time.time()
+
+    # Allocate IDs of the new events and bins
+
+    query = """
+        WITH source AS (
+            SELECT
+                e.id,
+                e.id_magic,
+                e.start + $5 AS target_start,
+                COALESCE(LEAD(e.start) OVER (ORDER BY e.start), $3) + $5
+                    AS target_end
+            FROM events AS e
+            WHERE e.id_channel = $1 AND e.start >= $2 AND e.start < $3
+        )
+        SELECT
+            s.id AS old_event,
+            s.id_magic AS old_bin,
+            t.taken,
+            CASE WHEN NOT t.taken
+                THEN nextval(pg_get_serial_sequence('events', 'id'))
+            END AS new_event,
+            CASE WHEN NOT t.taken AND s.id_magic IS NOT NULL
+                THEN nextval(pg_get_serial_sequence('bins', 'id'))
+            END AS new_bin
+        FROM source AS s
+        CROSS JOIN LATERAL (
+            SELECT EXISTS (
+                SELECT 1 FROM events
+                WHERE id_channel = $4
+                AND start >= s.target_start
+                AND start < s.target_end
+            ) AS taken
+        ) AS t
+        ORDER BY s.target_start
+    """
+    old_events: list[int] = []
+    new_events: list[int] = []
+    new_bins: list[int | None] = []
+    bin_map: list[tuple[int, int]] = []
+    skipped: list[int] = []
+    for row in await conn.fetch(
+        query, id_channel, start_time, end_time, target_channel, offset
+    ):
+        if row["taken"]:
+            skipped.append(row["old_event"])
+            continue
+        old_events.append(row["old_event"])
+        new_events.append(row["new_event"])
+        new_bins.append(row["new_bin"])
+        if row["new_bin"] is not None:
+            bin_map.append((row["old_bin"], row["new_bin"]))
+
+    if not new_events:
+        return [], skipped
+
+    await conn.execute(
+        """
+        INSERT INTO bins (id, bin_type, meta)
+        SELECT m.new_bin, b.bin_type, b.meta || jsonb_build_object(
+            'id', m.new_bin,
+            'ctime', $3::FLOAT8,
+            'mtime', $3::FLOAT8
+        )
+        FROM unnest($1::INTEGER[], $2::INTEGER[]) AS m(old_bin, new_bin)
+        JOIN bins AS b ON b.id = m.old_bin
+        """,
+        [old for old, _ in bin_map],
+        [new for _, new in bin_map],
+        now,
+    )
+
+    await conn.execute(
+        """
+        INSERT INTO events (id, id_channel, start, stop, id_magic, meta)
+        SELECT
+            m.new_event,
+            $4,
+            e.start + $5,
+            e.stop + $5,
+            m.new_bin,
+            e.meta || jsonb_build_object(
+                'id', m.new_event,
+                'id_channel', $4,
+                'start', e.start + $5,
+                'id_magic', m.new_bin,
+                'ctime', $6::FLOAT8,
+                'mtime', $6::FLOAT8
+            ) || CASE WHEN e.meta ? 'stop'
+                THEN jsonb_build_object('stop', (e.meta->>'stop')::FLOAT8 + $5)
+                ELSE '{}'::JSONB
+            END
+        FROM unnest($1::INTEGER[], $2::INTEGER[], $3::INTEGER[])
+            AS m(old_event, new_event, new_bin)
+        JOIN events AS e ON e.id = m.old_event
+        """,
+        old_events,
+        new_events,
+        new_bins,
+        target_channel,
+        offset,
+        now,
+    )
+
+    # Items of the copied bins
+
+    item_map = [
+        (row["old_item"], row["new_item"], row["new_bin"])
+        for row in await conn.fetch(
+            """
+            SELECT
+                i.id AS old_item,
+                nextval(pg_get_serial_sequence('items', 'id')) AS new_item,
+                m.new_bin
+            FROM unnest($1::INTEGER[], $2::INTEGER[]) AS m(old_bin, new_bin)
+            JOIN items AS i ON i.id_bin = m.old_bin
+            """,
+            [old for old, _ in bin_map],
+            [new for _, new in bin_map],
+        )
+    ]
+
+    if item_map:
+        await conn.execute(
+            """
+            INSERT INTO items (id, id_asset, id_bin, position, meta)
+            SELECT
+                m.new_item,
+                i.id_asset,
+                m.new_bin,
+                i.position,
+                i.meta || jsonb_build_object(
+                    'id', m.new_item,
+                    'id_bin', m.new_bin,
+                    'ctime', $4::FLOAT8,
+                    'mtime', $4::FLOAT8
+                )
+            FROM unnest($1::INTEGER[], $2::INTEGER[], $3::INTEGER[])
+                AS m(old_item, new_item, new_bin)
+            JOIN items AS i ON i.id = m.old_item
+            """,
+            [old for old, _, _ in item_map],
+            [new for _, new, _ in item_map],
+            [id_bin for _, _, id_bin in item_map],
+            now,
+        )
+
+    # Full-text index. Copied objects have the same indexed words,
+    # so the index rows and their fingerprints are copied as well
+
+    ft_map = [
+        *[
+            (ObjectTypeId.EVENT.value, old, new)
+            for old, new in zip(old_events, new_events, strict=True)
+        ],
+        *[(ObjectTypeId.BIN.value, old, new) for old, new in bin_map],
+        *[(ObjectTypeId.ITEM.value, old, new) for old, new, _ in item_map],
+    ]
+    ft_args = (
+        [object_type for object_type, _, _ in ft_map],
+        [old for _, old, _ in ft_map],
+        [new for _, _, new in ft_map],
+    )
+    await conn.execute(
+        """
+        INSERT INTO ft (id, object_type, weight, value)
+        SELECT m.new_id, f.object_type, f.weight, f.value
+        FROM unnest($1::INTEGER[], $2::INTEGER[], $3::INTEGER[])
+            AS m(object_type, old_id, new_id)
+        JOIN ft AS f ON f.object_type = m.object_type AND f.id = m.old_id
+        """,
+        *ft_args,
+    )
+    await conn.execute(
+        """
+        INSERT INTO ft_fingerprints (object_type, id, fingerprint)
+        SELECT f.object_type, m.new_id, f.fingerprint
+        FROM unnest($1::INTEGER[], $2::INTEGER[], $3::INTEGER[])
+            AS m(object_type, old_id, new_id)
+        JOIN ft_fingerprints AS f
+            ON f.object_type = m.object_type AND f.id = m.old_id
+        """,
+        *ft_args,
+    )
+
+    return new_events, skipped
+
+
+async def clone_schedule(
+    id_channel: int,
+    start_time: int,
+    end_time: int,
+    target_channel: int,
+    target_start: int,
+    mode: CloneMode = "skip",
+    user: nebula.User | None = None,
+) -> CloneScheduleResponseModel:
+    """Copy events of a channel range to another date and/or channel"""
+    username = user.name if user else None
+    offset = target_start - start_time
+    target_end = target_start + (end_time - start_time)
+
+    if (
+        target_channel == id_channel
+        and target_start < end_time
+        and start_time < target_end
+    ):
+        raise nebula.BadRequestException("Source and target ranges overlap")
+
+    deleted: list[int] = []
+    conflicts: list[SchedulerConflictModel] = []
+
+    pool = await nebula.db.pool()
+    async with pool.acquire() as conn, conn.transaction():
+        if mode == "overwrite":
+            query = """
+                SELECT id FROM events
+                WHERE id_channel = $1 AND start >= $2 AND start < $3
+            """
+            target_ids = [
+                row["id"]
+                for row in await conn.fetch(
+                    query, target_channel, target_start, target_end
+                )
+            ]
+            if target_ids:
+                deleted, conflicts = await delete_events(
+                    target_ids, user=user, conn=conn
+                )
+
+        created, skipped = await clone_events(
+            conn,
+            id_channel,
+            start_time,
+            end_time,
+            target_channel,
+            offset,
+        )
+
+    nebula.log.info(
+        f"Copied {len(created)} events from channel {id_channel} "
+        f"to channel {target_channel} "
+        f"({len(skipped)} skipped, {len(deleted)} deleted)",
+        user=username,
+    )
+
+    return CloneScheduleResponseModel(
+        created_events=created,
+        skipped_events=skipped,
+        deleted_events=deleted,
+        conflicts=conflicts,
+    )
@@ -0,0 +1,61 @@
+import nebula
+from nebula.helpers.scheduling import parse_rundown_date
+from server.dependencies import CurrentUser, RequestInitiator
+from server.request import APIRequest
+
+from .clone import clone_schedule
+from .models import CloneScheduleRequestModel, CloneScheduleResponseModel
+
+
+class CloneScheduleRequest(APIRequest):
+    """Copy a range of the schedule to another date and/or channel
+
+    Events of the given days are duplicated including their bins
+    and items. The copies keep their times relative to the start
+    of the range. Existing events of the target range are either
+    kept or deleted before copying, depending on the mode. When they
+    are kept, source events are not copied if an existing event starts
+    within the time the copy would run (until the start of the next one).
+    """
+
+    name = "clone-schedule"
+    title = "Clone schedule"
+    response_model = CloneScheduleResponseModel
+
+    async def handle(
+        self,
+        request: CloneScheduleRequestModel,
+        user: CurrentUser,
+        initiator: RequestInitiator,
+    ) -> CloneScheduleResponseModel:
+        id_target = request.target_channel or request.id_channel
+
+        if not (channel := nebula.settings.get_playout_channel(request.id_channel)):
+            raise nebula.BadRequestException(f"No such channel {request.id_channel}")
+        if not (target := nebula.settings.get_playout_channel(id_target)):
+            raise nebula.BadRequestException(f"No such channel {id_target}")
+
+        if not user.can("scheduler_view", channel.id):
+            raise nebula.ForbiddenException("You are not allowed to view this channel")
+        if not user.can("scheduler_edit", target.id):
+            raise nebula.ForbiddenException("You are not allowed to edit this channel")
+
+        start_time = parse_rundown_date(request.date, channel)
+        result = await clone_schedule(
+            channel.id,
+            start_time,
+            start_time + (request.days * 86400),
+            target.id,
+            parse_rundown_date(request.target_date, target),
+            mode=request.mode,
+            user=user,
+        )
+
+        if changed := result.created_events + result.deleted_events:
+            await nebula.msg(
+                "objects_changed",
+                objects=changed,
+                object_type="event",
+                initiator=initiator,
+            )
+        return result
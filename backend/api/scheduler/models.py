@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, Literal
 
 from pydantic import Field
 
@@ -42,6 +42,16 @@ class SchedulerRequestModel(RequestModel):
     )
 
 
+class SchedulerConflictModel(ResponseModel):
+    id_event: int = Field(..., title="Event ID", examples=[134])
+    detail: str = Field(
+        ...,
+        title="Detail",
+        description="Reason why the event was not deleted",
+        examples=["Cannot delete event containing aired items"],
+    )
+
+
 class SchedulerResponseModel(ResponseModel):
     affected_events: list[int] = Field(
         default_factory=list,
@@ -62,3 +72,93 @@ class SchedulerResponseModel(ResponseModel):
         title="Events",
         description="List of events",
     )
+
+    conflicts: list[SchedulerConflictModel] = Field(
+        default_factory=list,
+        title="Conflicts",
+        description="Events which were requested to be deleted, "
+        "but could not be deleted",
+    )
+
+
+class CloneScheduleRequestModel(RequestModel):
+    id_channel: int = Field(
+        ...,
+        title="Channel ID",
+        description="Channel to copy the events from",
+        examples=[1],
+    )
+
+    date: str = Field(
+        ...,
+        title="Date",
+        description="First day of the copied range in YYYY-MM-DD format",
+        pattern=r"\d{4}-\d{2}-\d{2}",
+        examples=["2022-07-25"],
+    )
+
+    days: int = Field(
+        7,
+        title="Days",
+        description="Number of days to copy. One week is the default",
+        ge=1,
+        le=366,
+        examples=[7],
+    )
+
+    target_date: str = Field(
+        ...,
+        title="Target date",
+        description="Day the copied range starts at in YYYY-MM-DD format",
+        pattern=r"\d{4}-\d{2}-\d{2}",
+        examples=["2022-08-01"],
+    )
+
+    target_channel: int | None = Field(
+        None,
+        title="Target channel ID",
+        description="Channel to copy the events to. "
+        "If not set, the events are copied within the source channel",
+        examples=[2],
+    )
+
+    mode: Literal["skip", "overwrite"] = Field(
+        "skip",
+        title="Mode",
+        description="How to handle existing events in the target range. "
+        "'skip' keeps existing events and does not copy a source event "
+        "if any existing event starts within the time it would run "
+        "(from its new start until the new start of the next copied event), "
+        "'overwrite' deletes events of the target range "
+        "(except the ones which were already broadcasted) before copying",
+    )
+
+
+class CloneScheduleResponseModel(ResponseModel):
+    created_events: list[int] = Field(
+        default_factory=list,
+        title="Created events",
+        description="IDs of the new events",
+        examples=[[234, 235, 236]],
+    )
+
+    skipped_events: list[int] = Field(
+        default_factory=list,
+        title="Skipped events",
+        description="IDs of the source events which were not copied, "
+        "because an event already exists at the target time",
+        examples=[[134]],
+    )
+
+    deleted_events: list[int] = Field(
+        default_factory=list,
+        title="Deleted events",
+        description="IDs of the target events deleted in the overwrite mode",
+        examples=[[201, 202]],
+    )
+
+    conflicts: list[SchedulerConflictModel] = Field(
+        default_factory=list,
+        title="Conflicts",
+        description="Target events which could not be deleted",
+    )
@@ -1,9 +1,21 @@
+from typing import TYPE_CHECKING
+
+import asyncpg
+
 import nebula
-from nebula.helpers.create_new_event import EventData, create_new_event
+from nebula.helpers.create_new_event import EventData, create_new_events
 from nebula.helpers.scheduling import parse_rundown_date
 
-from .models import SchedulerResponseModel
-from .utils import delete_events, get_event_at_time, get_events_in_range
+from .models import SchedulerConflictModel, SchedulerResponseModel
+from .utils import (
+    delete_events,
+    get_bin_items,
+    get_events_at_times,
+    get_events_in_range,
+)
+
+if TYPE_CHECKING:
+    from nebula.settings.models import PlayoutChannelSettings
 
 
 async def scheduler(
@@ -17,7 +29,6 @@ async def scheduler(
 ) -> SchedulerResponseModel:
     """Modify and display channel schedule"""
 
-    username = user.name if user else None
     start_time: float | None = None
     end_time: float | None = None
     delete = delete or []
@@ -32,117 +43,191 @@ async def scheduler(
 
     affected_events: list[int] = []
     affected_bins: list[int] = []
+    conflicts: list[SchedulerConflictModel] = []
 
     #
     # Delete events
     #
 
     if delete and editable:
-        deleted_event_ids = await delete_events(delete, user=user)
+        deleted_event_ids, conflicts = await delete_events(delete, user=user)
         affected_events.extend(deleted_event_ids)
     #
     # Create / update events
     #
 
-    for event_data in events:
-        if not editable:
-            # weird syntax, but keeps indentation level low
-            break
+    if events and editable:
+        changed_events, changed_bins = await apply_events(channel, events, user)
+        affected_events.extend(changed_events)
+        affected_bins.extend(changed_bins)
+
+    # Return existing events
+
+    if (start_time is not None) and (end_time is not None):
+        c_events = await get_events_in_range(
+            channel.id,
+            start_time,
+            end_time,
+            user=user,
+        )
+    else:
+        c_events = []
+    return SchedulerResponseModel(
+        events=[e.meta for e in c_events],
+        affected_events=list(dict.fromkeys(affected_events)),
+        affected_bins=list(dict.fromkeys(affected_bins)),
+        conflicts=conflicts,
+    )
 
-        event_at_position = await get_event_at_time(channel.id, event_data.start)
 
+async def apply_events(
+    channel: "PlayoutChannelSettings",
+    events: list[EventData],
+    user: nebula.User | None = None,
+) -> tuple[list[int], list[int]]:
+    """Create, update or replace events.
+
+    The whole batch is processed set-based: events at the requested
+    start times, events to update, assets and items are loaded using
+    one query each and all changes are stored in a single transaction.
+    Events at the requested start times are looked up in that transaction.
+    No notifications are sent.
+
+    Return IDs of affected events and bins.
+    """
+    pool = await nebula.db.pool()
+    async with pool.acquire() as conn, conn.transaction():
+        return await _apply_events(channel, events, user, conn)
+
+
+async def _apply_events(
+    channel: "PlayoutChannelSettings",
+    events: list[EventData],
+    user: nebula.User | None,
+    conn: asyncpg.pool.PoolConnectionProxy,
+) -> tuple[list[int], list[int]]:
+    username = user.name if user else None
+    affected_events: list[int] = []
+    affected_bins: list[int] = []
+
+    events_at_position = await get_events_at_times(
+        conn, channel.id, [event_data.start for event_data in events]
+    )
+
+    replacements: list[tuple[EventData, nebula.Event]] = []
+    updates: list[EventData] = []
+    creations: list[EventData] = []
+
+    for event_data in events:
+        event_at_position = events_at_position.get(event_data.start)
         if (event_at_position is not None) and event_at_position.id != event_data.id:
             # Replace event at position
 
             assert event_at_position.id is not None, (
                 "Event at position returned event without ID. This should not happen."
             )
-            affected_events.append(event_at_position.id)
 
-            if event_data.id_asset:
-                # Replace event with another asset.
-                # This should be supported, but is not yet.
-
-                if event_data.id_asset == event_at_position["id_asset"]:
-                    # Replace event with itself. This is a no-op.
-                    continue
-
-                asset = await nebula.Asset.load(event_data.id_asset, username=username)
-                assert asset
-
-                # load the existing bin
-                ex_bin = await nebula.Bin.load(
-                    event_at_position["id_magic"], username=username
-                )
-                await ex_bin.get_items()
-
-                for item in ex_bin.items:
-                    if item["id_asset"] == event_at_position["id_asset"]:
-                        # replace the asset in the bin
-                        item["id_asset"] = event_data.id_asset
-                        item["mark_in"] = asset["mark_in"]
-                        item["mark_out"] = asset["mark_out"]
-                        await item.save()
-                        break
-                else:
-                    # no primary asset found, so append it
-                    new_item = nebula.Item(username=username)
-                    new_item["id_asset"] = event_data.id_asset
-                    new_item["id_bin"] = ex_bin.id
-                    new_item["position"] = len(ex_bin.items)
-                    new_item["mark_in"] = asset["mark_in"]
-                    new_item["mark_out"] = asset["mark_out"]
-                    await new_item.save()
-                    ex_bin.items.append(new_item)
-                    assert ex_bin.id is not None, (
-                        "Bin ID should not be None at this point"
-                    )
-                    affected_bins.append(ex_bin.id)
-
-                # update the event
-                event_at_position["id_asset"] = event_data.id_asset
-                for field in channel.fields:
-                    if field.name in ["color", "start", "stop", "promoted"]:
-                        continue
-                    event_at_position[field.name] = asset[field.name]
-                affected_events.append(event_at_position.id)
-                await ex_bin.save()
-                await event_at_position.save()
-
-                # TODO: Implement replacing events
-
-            else:
+            if not event_data.id_asset:
                 # Replace event with an event without an asset.
                 # This does not make sense so it is not supported
                 raise nebula.BadRequestException("Replacing events is not supported")
 
+            affected_events.append(event_at_position.id)
+            if event_data.id_asset == event_at_position["id_asset"]:
+                # Replace event with itself. This is a no-op.
+                continue
+            replacements.append((event_data, event_at_position))
+
         elif event_data.id:
-            # Update existing event
-            event = await nebula.Event.load(event_data.id, username=username)
-            event["start"] = event_data.start
-            for field in channel.fields:
-                if event_data.meta and (field.name in event_data.meta):
-                    event[field.name] = event_data.meta[field.name]
-            affected_events.append(event_data.id)
-            await event.save(notify=False)
+            updates.append(event_data)
 
         else:
-            # create new event
-            await create_new_event(channel, event_data, user=user)
+            creations.append(event_data)
 
-    # Return existing events
+    # Load everything needed at once
 
-    if (start_time is not None) and (end_time is not None):
-        c_events = await get_events_in_range(
-            channel.id,
-            start_time,
-            end_time,
-            user=user,
+    asset_ids = [
+        event_data.id_asset for event_data, _ in replacements if event_data.id_asset
+    ]
+    assets = {
+        asset.id: asset
+        for asset in await nebula.Asset.load_many(
+            list(dict.fromkeys(asset_ids)), connection=conn, username=username
         )
-    else:
-        c_events = []
-    return SchedulerResponseModel(
-        events=[e.meta for e in c_events],
-        affected_events=affected_events,
-        affected_bins=affected_bins,
+    }
+    if missing_assets := {id for id in asset_ids if id not in assets}:
+        raise nebula.NotFoundException(f"Assets {sorted(missing_assets)} not found")
+
+    event_ids = [event_data.id for event_data in updates if event_data.id]
+    loaded_events = {
+        event.id: event
+        for event in await nebula.Event.load_many(
+            list(dict.fromkeys(event_ids)), connection=conn, username=username
+        )
+    }
+    if missing_events := set(event_ids) - set(loaded_events):
+        raise nebula.NotFoundException(f"Events {sorted(missing_events)} not found")
+
+    bin_items = await get_bin_items(
+        [event["id_magic"] for _, event in replacements if event["id_magic"]]
     )
+
+    # Apply the changes
+
+    items_to_save: list[nebula.Item] = []
+    events_to_save: list[nebula.Event] = []
+
+    for event_data, event_at_position in replacements:
+        assert event_data.id_asset is not None
+        assert event_at_position.id is not None
+        asset = assets[event_data.id_asset]
+        id_bin = event_at_position["id_magic"]
+        items = bin_items.get(id_bin, [])
+
+        for item in items:
+            if item["id_asset"] == event_at_position["id_asset"]:
+                # replace the asset in the bin
+                item["id_asset"] = event_data.id_asset
+                item["mark_in"] = asset["mark_in"]
+                item["mark_out"] = asset["mark_out"]
+                items_to_save.append(item)
+                break
+        else:
+            # no primary asset found, so append it
+            new_item = nebula.Item(username=username)
+            new_item["id_asset"] = event_data.id_asset
+            new_item["id_bin"] = id_bin
+            new_item["position"] = len(items)
+            new_item["mark_in"] = asset["mark_in"]
+            new_item["mark_out"] = asset["mark_out"]
+            items_to_save.append(new_item)
+            items.append(new_item)
+        affected_bins.append(id_bin)
+
+        # update the event
+        event_at_position["id_asset"] = event_data.id_asset
+        for field in channel.fields:
+            if field.name in ["color", "start", "stop", "promoted"]:
+                continue
+            event_at_position[field.name] = asset[field.name]
+        events_to_save.append(event_at_position)
+
+    for event_data in updates:
+        assert event_data.id is not None
+        event = loaded_events[event_data.id]
+        event["start"] = event_data.start
+        for field in channel.fields:
+            if event_data.meta and (field.name in event_data.meta):
+                event[field.name] = event_data.meta[field.name]
+        affected_events.append(event_data.id)
+        events_to_save.append(event)
+
+    await nebula.Item.save_many(items_to_save, connection=conn, notify=False)
+    await nebula.Event.save_many(events_to_save, connection=conn, notify=False)
+    new_events = await create_new_events(channel, creations, user=user, conn=conn)
+
+    for new_event in new_events:
+        assert new_event.id is not None
+        affected_events.append(new_event.id)
+
+    return affected_events, affected_bins
@@ -1,64 +1,155 @@
 import asyncpg
 
 import nebula
+from nebula.enum import ObjectTypeId
+from nebula.objects.identity_map import evict_objects
 from nx.utils import format_time
 
+from .models import SchedulerConflictModel
 
-async def get_event_at_time(id_channel: int, timestamp: int) -> nebula.Event | None:
-    """Return an event at the given timestamp on the given channel.
 
-    If there is no event at the given timestamp, return None.
+async def get_events_at_times(
+    conn: asyncpg.pool.PoolConnectionProxy,
+    id_channel: int,
+    timestamps: list[int],
+) -> dict[int, nebula.Event]:
+    """Return events starting at the given timestamps on the given channel.
+
+    Result is keyed by the start time. Timestamps without an event are omitted.
     Note: This function looks for the EXACT start timestamp, not for the closest event,
     or an ongoing event. This is used in scheduler for replacing existing events.
+
+    Events are queried and locked using the given connection, so the result
+    is consistent with the changes made in its transaction.
     """
     query = """
-        SELECT meta FROM events
-        WHERE id_channel = $1 AND start = $2
-        LIMIT 1
+        SELECT start, meta FROM events
+        WHERE id_channel = $1 AND start = ANY($2)
+        ORDER BY id
+        FOR UPDATE
     """
+    result: dict[int, nebula.Event] = {}
+    for row in await conn.fetch(query, id_channel, list(dict.fromkeys(timestamps))):
+        result.setdefault(row["start"], nebula.Event.from_meta(row["meta"]))
+    return result
 
-    async for record in nebula.db.iterate(query, id_channel, timestamp):
-        return nebula.Event.from_meta(record["meta"])
-    return None
 
+async def get_bin_items(bins: list[int]) -> dict[int, list[nebula.Item]]:
+    """Return items of the given bins ordered by their position"""
+    query = """
+        SELECT id_bin, meta FROM items
+        WHERE id_bin = ANY($1)
+        ORDER BY id_bin, position
+    """
+    result: dict[int, list[nebula.Item]] = {id_bin: [] for id_bin in bins}
+    async for record in nebula.db.iterate(query, bins):
+        result[record["id_bin"]].append(nebula.Item.from_meta(record["meta"]))
+    return result
 
-async def delete_events(ids: list[int], user: nebula.User | None = None) -> list[int]:
+
+async def delete_events(
+    ids: list[int],
+    user: nebula.User | None = None,
+    conn: asyncpg.pool.PoolConnectionProxy | None = None,
+) -> tuple[list[int], list[SchedulerConflictModel]]:
     """Delete events from the database.
 
     It also deletes the associated bins and items. Events with
     already broadcasted items are not deleted since they are
-    needed for statistics.
+    needed for statistics. Such events are detected before
+    deleting anything and reported as conflicts.
 
-    Returns a list of event IDs that were deleted.
+    Items, bins, events and their full-text index are deleted
+    using one statement per table in a single transaction.
+    When a connection is provided, its transaction is used.
+
+    Returns a list of event IDs that were deleted and a list of conflicts.
     """
+    if conn is None:
+        pool = await nebula.db.pool()
+        async with pool.acquire() as pconn, pconn.transaction():
+            return await delete_events(ids, user=user, conn=pconn)
 
     username = user.name if user else None
+    conflicts: list[SchedulerConflictModel] = []
+    event_ids: list[int] = []
+    bin_ids: list[int] = []
 
-    deleted_event_ids = []
-    pool = await nebula.db.pool()
-    async with pool.acquire() as conn, conn.transaction():
-        for id_event in ids:
-            event = await nebula.Event.load(id_event, username=username)
-            id_bin = event["id_magic"]
-
-            try:
-                await nebula.db.execute(
-                    "DELETE FROM items WHERE id_bin = $1",
-                    id_bin,
+    query = """
+        SELECT e.id, e.id_magic, EXISTS (
+            SELECT 1 FROM items AS i
+            JOIN asrun AS a ON a.id_item = i.id
+            WHERE i.id_bin = e.id_magic
+        ) AS aired
+        FROM events AS e
+        WHERE e.id = ANY($1)
+        FOR UPDATE OF e
+    """
+    found: set[int] = set()
+    for row in await conn.fetch(query, ids):
+        found.add(row["id"])
+        if row["aired"]:
+            conflicts.append(
+                SchedulerConflictModel(
+                    id_event=row["id"],
+                    detail="Cannot delete event containing aired items",
                 )
-            except asyncpg.exceptions.ForeignKeyViolationError as e:
-                raise nebula.ConflictException(
-                    "Cannot delete event containing aired items"
-                ) from e
-            except Exception:
-                nebula.log.traceback(f"Failed to delete items of {event}")
-                continue
-
-            await nebula.db.execute("DELETE FROM bins WHERE id = $1", id_bin)
-            await nebula.db.execute("DELETE FROM events WHERE id = $1", id_event)
-
-            deleted_event_ids.append(id_event)
-    return deleted_event_ids
+            )
+            continue
+        event_ids.append(row["id"])
+        if row["id_magic"]:
+            bin_ids.append(row["id_magic"])
+
+    for id_event in dict.fromkeys(ids):
+        if id_event not in found:
+            conflicts.append(
+                SchedulerConflictModel(id_event=id_event, detail="Event not found")
+            )
+
+    if not event_ids:
+        return [], conflicts
+
+    try:
+        item_ids = [
+            row["id"]
+            for row in await conn.fetch(
+                "DELETE FROM items WHERE id_bin = ANY($1) RETURNING id",
+                bin_ids,
+            )
+        ]
+    except asyncpg.exceptions.ForeignKeyViolationError as e:
+        # An item was aired in the meantime
+        raise nebula.ConflictException(
+            "Cannot delete event containing aired items"
+        ) from e
+
+    await conn.execute("DELETE FROM bins WHERE id = ANY($1)", bin_ids)
+    await conn.execute("DELETE FROM events WHERE id = ANY($1)", event_ids)
+    for table in ["ft", "ft_fingerprints"]:
+        await conn.execute(
+            f"""
+            DELETE FROM {table} WHERE
+                (object_type = $1 AND id = ANY($2))
+             OR (object_type = $3 AND id = ANY($4))
+             OR (object_type = $5 AND id = ANY($6))
+            """,
+            ObjectTypeId.ITEM.value,
+            item_ids,
+            ObjectTypeId.BIN.value,
+            bin_ids,
+            ObjectTypeId.EVENT.value,
+            event_ids,
+        )
+
+    evict_objects("item", item_ids)
+    evict_objects("bin", bin_ids)
+    evict_objects("event", event_ids)
+
+    nebula.log.info(
+        f"Deleted {len(event_ids)} events with {len(item_ids)} items",
+        user=username,
+    )
+    return event_ids, conflicts
 
 
 async def get_events_in_range(
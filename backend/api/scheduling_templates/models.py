@@ -41,6 +41,16 @@ class ApplyTemplateRequestModel(RequestModel):
             examples=["2022-12-31"],
         ),
     ]
+    weeks: Annotated[
+        int,
+        Field(
+            title="Weeks",
+            description="Number of weeks to apply the template to, "
+            "starting with the week of the given date",
+            ge=1,
+            le=53,
+        ),
+    ] = 1
     clear: Annotated[
         bool,
         Field(
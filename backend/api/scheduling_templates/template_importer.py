@@ -62,6 +62,14 @@ class TemplateImporter:
                 self._apply_day_template(day_name, day_start_ts)
         return self.events
 
+    def build_for_weeks(self, date: str, weeks: int = 1) -> dict[int, Any]:
+        """Build events for the given number of weeks starting with the date"""
+        first_day = datetime.datetime.strptime(date, "%Y-%m-%d")
+        for i in range(weeks):
+            week_date = first_day + datetime.timedelta(weeks=i)
+            self.build_for_week(week_date.strftime("%Y-%m-%d"))
+        return self.events
+
     def _apply_day_template(self, key: DayKey, day_start_ts: int) -> None:
         day_tpl = self.template.get(key, [])
 
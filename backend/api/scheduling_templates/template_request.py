@@ -1,5 +1,6 @@
 import nebula
-from nebula.helpers.create_new_event import create_new_event
+from api.scheduler.utils import delete_events
+from nebula.helpers.create_new_event import create_new_events
 from server.dependencies import CurrentUser, RequestInitiator
 from server.request import APIRequest
 
@@ -9,7 +10,9 @@ from .models import (
     TemplateItemModel,
 )
 from .template_importer import TemplateImporter
-from .utils import list_templates, load_template
+from .utils import is_too_close, list_templates, load_template
+
+MINIMUM_GAP_SECONDS = 5 * 60
 
 
 class ListTemplatesRequest(APIRequest):
@@ -59,7 +62,7 @@ class ApplyTemplateRequest(APIRequest):
         hh, mm = channel.day_start
 
         importer = TemplateImporter(template.get("schedule", {}), hh, mm)
-        edata = importer.build_for_week(request.date)
+        edata = importer.build_for_weeks(request.date, request.weeks)
 
         if not edata:
             nebula.log.warn("No events found in template")
@@ -68,38 +71,70 @@ class ApplyTemplateRequest(APIRequest):
         first_ts = min(edata.keys())
         last_ts = max(edata.keys())
 
+        deleted_ids: list[int] = []
         pool = await nebula.db.pool()
         async with pool.acquire() as conn, conn.transaction():
             if request.clear:
-                # Clear mode
-                query = """
-                    DELETE FROM events
-                    WHERE start >= $1 AND start <= $2 AND id_channel = $3
-                """
-                await conn.execute(query, first_ts, last_ts, request.id_channel)
-
-            else:
-                # Merge mode
+                # Clear mode. Events with aired items are kept
                 query = """
-                    SELECT start FROM events
+                    SELECT id FROM events
                     WHERE start >= $1 AND start <= $2 AND id_channel = $3
                 """
-                existing_times = []
-                async for row in nebula.db.iterate(
-                    query, first_ts, last_ts, request.id_channel
-                ):
-                    existing_times.append(row["start"])
-
-                MINIMUM_GAP_SECONDS = 5 * 60
-                for new_ts in list(edata.keys()):
-                    if any(
-                        abs(new_ts - existing_ts) < MINIMUM_GAP_SECONDS
-                        for existing_ts in existing_times
-                    ):
+                if ids := [
+                    row["id"]
+                    for row in await conn.fetch(
+                        query, first_ts, last_ts, request.id_channel
+                    )
+                ]:
+                    deleted_ids, conflicts = await delete_events(
+                        ids, user=user, conn=conn
+                    )
+                    for conflict in conflicts:
                         nebula.log.warn(
-                            f"Skipping event at {new_ts}: too close to existing event"
+                            f"Event {conflict.id_event} not deleted: {conflict.detail}",
+                            user=user.name,
                         )
-                        edata.pop(new_ts)
 
-            for _, event_data in edata.items():
-                await create_new_event(channel, event_data, user, conn)
+            # Merge mode (or events kept by the clear mode)
+
+            query = """
+                SELECT start FROM events
+                WHERE id_channel = $1 AND start >= $2 AND start < $3
+                ORDER BY start
+            """
+            existing_times = [
+                row["start"]
+                for row in await conn.fetch(
+                    query,
+                    request.id_channel,
+                    first_ts - MINIMUM_GAP_SECONDS + 1,
+                    last_ts + MINIMUM_GAP_SECONDS,
+                )
+            ]
+
+            for new_ts in list(edata.keys()):
+                if is_too_close(existing_times, new_ts, MINIMUM_GAP_SECONDS):
+                    nebula.log.warn(
+                        f"Skipping event at {new_ts}: too close to existing event"
+                    )
+                    edata.pop(new_ts)
+
+            new_events = await create_new_events(
+                channel,
+                [edata[ts] for ts in sorted(edata)],
+                user=user,
+                conn=conn,
+            )
+
+        nebula.log.info(
+            f"Applied template {request.template_name} to channel {channel.name}: "
+            f"{len(new_events)} events created",
+            user=user.name,
+        )
+        if changed := [*deleted_ids, *[event.id for event in new_events if event.id]]:
+            await nebula.msg(
+                "objects_changed",
+                object_type="event",
+                objects=changed,
+                initiator=initiator,
+            )
@@ -1,3 +1,4 @@
+import bisect
 import datetime
 import json
 import os
@@ -51,3 +52,9 @@ def get_week_start(date: str, hour: int = 0, minute: int = 0) -> datetime.dateti
         minute,
     )
     return week_start
+
+
+def is_too_close(timestamps: list[int], timestamp: int, gap: int) -> bool:
+    """Check whether a sorted list contains a timestamp closer than gap"""
+    index = bisect.bisect_right(timestamps, timestamp - gap)
+    return index < len(timestamps) and timestamps[index] < timestamp + gap
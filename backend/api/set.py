@@ -6,7 +6,7 @@ from pydantic import Field
 import nebula
 from nebula.common import import_module
 from nebula.enum import ObjectType
-from nebula.helpers.scheduling import bin_refresh
+from nebula.helpers.scheduling import enqueue_bin_refresh
 from nebula.objects.base import BaseObject
 from nebula.objects.utils import get_object_class_by_name
 from nebula.settings import load_settings
@@ -269,7 +269,7 @@ class OperationsRequest(APIRequest):
             )
 
         if affected_bins:
-            await bin_refresh(affected_bins)
+            await enqueue_bin_refresh(affected_bins, user=user)
 
         if reload_settings:
             await load_settings()
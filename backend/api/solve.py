@@ -1,13 +1,20 @@
-from fastapi import Response
+import asyncio
+import contextvars
+
 from pydantic import Field
 
 import nebula
 from nebula.exceptions import BadRequestException
 from nebula.plugins.library import plugin_library
-from server.dependencies import CurrentUser
-from server.models import RequestModel
+from nebula.plugins.solver_runner import SolverRun
+from server.dependencies import CurrentUser, RequestInitiator
+from server.models import RequestModel, ResponseModel
 from server.request import APIRequest
 
+# References to the runs solved in the background,
+# so they are not garbage collected before they finish
+background_runs: set[asyncio.Task[SolverRun]] = set()
+
 
 class SolveRequestModel(RequestModel):
     solver: str = Field(..., examples=["dramatica"])
@@ -16,20 +23,46 @@ class SolveRequestModel(RequestModel):
         examples=[[1, 2, 3]],
         description="List of placeholder item IDs to solve",
     )
+    background: bool = Field(
+        False,
+        description="Return immediately and solve the placeholders in the "
+        "background. Progress is reported using solver_progress messages",
+    )
+
+
+class SolveResponseModel(ResponseModel):
+    id: str = Field(
+        ...,
+        title="Run ID",
+        description="ID of the solver run used in solver_progress messages",
+    )
+    solved: list[int] = Field(
+        default_factory=list,
+        description="Solved placeholders. Empty for background runs",
+    )
+    failed: list[int] = Field(
+        default_factory=list,
+        description="Placeholders which could not be solved. Empty for background runs",
+    )
 
 
 class Request(APIRequest):
-    """Solve a rundown placeholder"""
+    """Solve rundown placeholders
+
+    Placeholders of different channels are solved concurrently.
+    Placeholders which could not be solved are listed in the response.
+    """
 
     name = "solve"
     title = "Solve"
-    responses: list[int] = [200]
+    response_model = SolveResponseModel
 
     async def handle(
         self,
         request: SolveRequestModel,
         user: CurrentUser,
-    ) -> Response:
+        initiator: RequestInitiator,
+    ) -> SolveResponseModel:
         # Get the list of channels of the requested items
 
         query = """
@@ -50,7 +83,17 @@ class Request(APIRequest):
         except KeyError as e:
             raise BadRequestException(f"Solver {request.solver} not found") from e
 
-        for item in request.items:
-            await solver(item)
+        run = SolverRun(solver, request.items, user=user, initiator=initiator)
+
+        if request.background:
+            # The run outlives the request, so it must not use
+            # its context (such as the request identity map)
+            task = asyncio.create_task(run.run(), context=contextvars.Context())
+            background_runs.add(task)
+            task.add_done_callback(background_runs.discard)
+            return SolveResponseModel(id=run.id)
 
-        return Response(status_code=200)
+        # Placeholders solved before a failure are saved,
+        # so partial results are returned instead of an error
+        await run.run()
+        return SolveResponseModel(id=run.id, solved=run.solved, failed=run.failed)
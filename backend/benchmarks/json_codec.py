@@ -0,0 +1,129 @@
+"""JSON codec micro-benchmark
+
+Measures how fast asset metadata is decoded from JSONB payloads as they
+arrive from Postgres, comparing the standard library decoder with the
+codec used by nebula.common (orjson, when installed).
+
+Usage (from the backend directory):
+
+    python -m benchmarks.json_codec [--count 10000]
+"""
+
+import argparse
+import json
+import random
+import time
+from collections.abc import Callable
+from typing import Any
+
+from nebula.common import has_orjson, json_dumpb, json_dumps, json_loads
+from nebula.db import decode_jsonb, encode_jsonb
+
+# Benchmark data does not need to be cryptographically secure
+rng = random.Random(0)  # noqa: S311
+
+WORDS = [
+    "news", "sport", "weather", "documentary", "episode", "season", "live",
+    "report", "interview", "studio", "evening", "morning", "special", "music",
+    "concert", "magazine", "series", "premiere", "nature", "history",
+]  # fmt: skip
+
+
+def sentence(length: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length)).capitalize()
+
+
+def create_asset_meta(id: int) -> dict[str, Any]:
+    """Return metadata resembling a real-world asset"""
+    now = time.time()
+    return {
+        "id": id,
+        "id_folder": rng.randint(1, 12),
+        "media_type": 1,
+        "content_type": 2,
+        "status": 1,
+        "version_of": 0,
+        "ctime": now - rng.randint(0, 10**7),
+        "mtime": now,
+        "title": sentence(4),
+        "subtitle": sentence(6),
+        "description": sentence(60),
+        "genre": "urn:ebu:metadata-cs:ContentGenreCS:2005:3.6.1",
+        "editorial_format": "urn:ebu:metadata-cs:EditorialFormatCodeCS:2017:1.1",
+        "id/main": f"{id:06d}",
+        "path": f"media.dir/{id:06d}.mxf",
+        "duration": rng.uniform(30, 7200),
+        "mark_in": 0,
+        "mark_out": 0,
+        "file/size": rng.randint(10**8, 10**11),
+        "file/mtime": int(now),
+        "video/width": 1920,
+        "video/height": 1080,
+        "video/fps": "25/1",
+        "video/codec": "h264",
+        "video/pixel_format": "yuv420p",
+        "video/color_space": "bt709",
+        "audio/tracks": [
+            {"index": i, "channels": 2, "language": "eng", "codec": "aac"}
+            for i in range(4)
+        ],
+        "qc/state": 4,
+        "qc/report": sentence(20),
+        "subclips": [
+            {"mark_in": i * 60.0, "mark_out": i * 60.0 + 45, "title": sentence(3)}
+            for i in range(rng.randint(0, 8))
+        ],
+    }
+
+
+def measure(name: str, func: Callable[[Any], Any], payloads: list[Any]) -> float:
+    start = time.perf_counter()
+    for payload in payloads:
+        func(payload)
+    elapsed = time.perf_counter() - start
+    rate = len(payloads) / elapsed
+    print(f"{name:<40} {elapsed * 1000:>9.1f} ms {rate:>12,.0f} docs/s")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=10000)
+    args = parser.parse_args()
+
+    metas = [create_asset_meta(i) for i in range(1, args.count + 1)]
+    text_payloads = [json.dumps(meta).encode("utf-8") for meta in metas]
+    binary_payloads = [encode_jsonb(meta) for meta in metas]
+
+    avg_size = sum(len(p) for p in text_payloads) / len(text_payloads)
+    print(f"{args.count} documents, {avg_size:.0f} bytes on average")
+    print(f"orjson available: {has_orjson}")
+    print()
+
+    # Text format payloads are decoded to str by asyncpg before
+    # they are passed to the codec, so the decoding is included
+
+    print("Decoding")
+    baseline = measure(
+        "stdlib json.loads (text)",
+        lambda p: json.loads(p.decode("utf-8")),
+        text_payloads,
+    )
+    fast = measure(
+        "json_loads (text)",
+        lambda p: json_loads(p.decode("utf-8")),
+        text_payloads,
+    )
+    binary = measure("decode_jsonb (binary)", decode_jsonb, binary_payloads)
+    print(f"speedup: text {baseline / fast:.2f}x, binary {baseline / binary:.2f}x")
+    print()
+
+    print("Encoding")
+    baseline = measure("stdlib json.dumps", json.dumps, metas)
+    measure("json_dumps", json_dumps, metas)
+    fast = measure("json_dumpb", json_dumpb, metas)
+    print(f"speedup: {baseline / fast:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Rundown row assembly benchmark
+
+Compares building rundown rows from the query records using Event, Item
+and Asset objects (the original implementation) with the lightweight
+record path used by the rundown endpoint (api/rundown/records.py).
+
+Both implementations are run on the same synthetic day and their results
+are compared, so the benchmark also checks that they are equivalent.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.rundown_rows [--rows 1000] [--repeat 20]
+"""
+
+import argparse
+import random
+import time
+from collections.abc import Callable
+from typing import Any
+
+import nebula
+from api.rundown.models import RundownRow
+from api.rundown.records import RundownRecord, build_rows
+from nebula.enum import ObjectStatus, RunMode
+from nebula.settings.models import PlayoutChannelSettings
+
+# Benchmark data does not need to be cryptographically secure
+rng = random.Random(0)  # noqa: S311
+
+ITEMS_PER_EVENT = 24
+
+
+def create_records(count: int, id_channel: int) -> list[dict[str, Any]]:
+    """Return records resembling the result of the rundown query"""
+    pskey = f"playout_status/{id_channel}"
+    records: list[dict[str, Any]] = []
+    start = 1_700_000_000
+    id_event = 0
+    while len(records) < count:
+        id_event += 1
+        emeta = {
+            "id": id_event,
+            "id_channel": id_channel,
+            "id_magic": id_event,
+            "start": start,
+            "title": f"Event {id_event}",
+        }
+        for position in range(ITEMS_PER_EVENT):
+            id_item = id_event * 1000 + position
+            id_asset = rng.randint(1, 10**5)
+            duration = rng.uniform(10, 600)
+            ameta = {
+                "id": id_asset,
+                "id_folder": rng.randint(1, 12),
+                "status": ObjectStatus.ONLINE,
+                "title": f"Asset {id_asset}",
+                "subtitle": f"Part {position}",
+                "duration": duration,
+                "mtime": start,
+                "genre": "urn:ebu:metadata-cs:ContentGenreCS:2005:3.6.1",
+                "editorial_format": "urn:ebu:metadata-cs:EditorialFormatCodeCS:2017",
+                pskey: {"status": rng.choice(list(ObjectStatus))},
+            }
+            imeta: dict[str, Any] = {
+                "id": id_item,
+                "id_bin": id_event,
+                "id_asset": id_asset,
+                "position": position,
+            }
+            if position % 5 == 0:
+                imeta["mark_out"] = duration / 2
+            aired = position < ITEMS_PER_EVENT // 2
+            records.append(
+                {
+                    "id_event": id_event,
+                    "id_bin": id_event,
+                    "id_item": id_item,
+                    "emeta": emeta,
+                    "imeta": imeta,
+                    "ameta": ameta,
+                    "as_start": start if aired else None,
+                    "as_stop": start + duration if aired else None,
+                }
+            )
+            start += int(duration)
+    return records[:count]
+
+
+def build_rows_objects(
+    channel: PlayoutChannelSettings,
+    records: list[dict[str, Any]],
+) -> tuple[list[RundownRow], dict[int, float]]:
+    """Original object-based row assembly"""
+    pskey = f"playout_status/{channel.id}"
+    rows: list[RundownRow] = []
+    asrun_starts: dict[int, float] = {}
+    last_event = None
+
+    for record in records:
+        id_event = record["id_event"]
+        id_item = record["id_item"]
+        id_bin = record["id_bin"]
+        emeta = record["emeta"] or {}
+        imeta = record["imeta"] or {}
+        ameta = record["ameta"] or {}
+
+        event = nebula.Event.from_meta(emeta)
+        item = nebula.Item.from_meta(imeta)
+        asset = None
+        if ameta:
+            asset = nebula.Asset.from_meta(ameta)
+            item.asset = asset
+
+        if (last_event is None) or (id_event != last_event.id):
+            last_event = RundownRow(
+                id=id_event,
+                type="event",
+                row_number=len(rows),
+                scheduled_time=event["start"],
+                broadcast_time=event["start"],
+                run_mode=event.get("run_mode", RunMode.RUN_AUTO),
+                title=event.get("title"),
+                subtitle=event.get("subtitle"),
+                id_asset=event.get("id_asset"),
+                id_bin=id_bin,
+                id_event=id_event,
+                meta=emeta,
+            )
+            rows.append(last_event)
+
+        airstatus: ObjectStatus | None = None
+        if (as_start := record["as_start"]) is not None:
+            asrun_starts[id_item] = as_start
+            airstatus = ObjectStatus.AIRED if record["as_stop"] else ObjectStatus.ONAIR
+
+        istatus: ObjectStatus
+        if not ameta:
+            istatus = ObjectStatus.ONLINE
+        elif ameta.get("status") == ObjectStatus.OFFLINE:
+            istatus = ObjectStatus.OFFLINE
+        elif pskey not in ameta or ameta[pskey]["status"] == ObjectStatus.OFFLINE:
+            istatus = ObjectStatus.REMOTE
+        elif ameta[pskey]["status"] == ObjectStatus.CORRUPTED:
+            istatus = ObjectStatus.CORRUPTED
+        elif ameta[pskey]["status"] == ObjectStatus.ONLINE:
+            istatus = airstatus if airstatus is not None else ObjectStatus.ONLINE
+        else:
+            istatus = ObjectStatus.UNKNOWN
+
+        meta = {}
+        if asset:
+            for key in channel.rundown_columns:
+                if key in asset.meta and key not in [
+                    "title",
+                    "subtitle",
+                    "id_asset",
+                    "duration",
+                    "status",
+                    "mark_in",
+                    "mark_out",
+                ]:
+                    meta[key] = asset.meta[key]
+
+        id_asset = imeta.get("id_asset")
+        rows.append(
+            RundownRow(
+                id=id_item,
+                row_number=len(rows),
+                type="item",
+                scheduled_time=0,
+                broadcast_time=0,
+                run_mode=imeta.get("run_mode"),
+                loop=imeta.get("loop"),
+                item_role=imeta.get("item_role"),
+                title=item["title"],
+                subtitle=item["subtitle"],
+                note=item["note"] or None,
+                id_asset=id_asset,
+                id_bin=id_bin,
+                id_event=id_event,
+                id_folder=asset["id_folder"] if asset else None,
+                duration=item.duration,
+                status=istatus,
+                asset_mtime=ameta.get("mtime", 0),
+                mark_in=item.meta.get("mark_in"),
+                mark_out=item.meta.get("mark_out"),
+                is_empty=False,
+                is_primary=bool(
+                    event.get("id_asset") and event["id_asset"] == id_asset
+                ),
+                meta=meta,
+            )
+        )
+
+    return rows, asrun_starts
+
+
+def measure(name: str, func: Callable[[], Any], repeat: int, count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) / repeat
+    rate = count / elapsed
+    print(f"{name:<30} {elapsed * 1000:>9.2f} ms/day {rate:>12,.0f} rows/s")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    channel = PlayoutChannelSettings(
+        id=1,
+        name="Benchmark",
+        engine="dummy",
+        rundown_columns=["id_folder", "genre", "editorial_format", "content_type"],
+    )
+    records = create_records(args.rows, channel.id)
+    print(f"{len(records)} item records, {ITEMS_PER_EVENT} items per event")
+    print()
+
+    objects = build_rows_objects(channel, records)
+    lightweight = build_rows(channel, [RundownRecord(r) for r in records])
+    assert objects[1] == lightweight[1], "As-run starts differ"
+    assert [row.model_dump() for row in objects[0]] == [
+        row.model_dump() for row in lightweight[0]
+    ], "Rows differ"
+
+    baseline = measure(
+        "objects",
+        lambda: build_rows_objects(channel, records),
+        args.repeat,
+        len(records),
+    )
+    fast = measure(
+        "lightweight records",
+        lambda: build_rows(channel, [RundownRecord(r) for r in records]),
+        args.repeat,
+        len(records),
+    )
+    print(f"speedup: {baseline / fast:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,28 +8,90 @@ import time
 from types import ModuleType
 from typing import Any, Literal, TypeVar
 
+try:
+    import orjson
+
+    has_orjson = True
+except ModuleNotFoundError:
+    has_orjson = False
+
 T = TypeVar("T", bound=type)
 
 SerializableValue = int | float | str | bool | dict[str, Any] | list[Any] | None
 
+#
+# JSON codec
+#
+# orjson is used when available. Values orjson refuses to serialize
+# (for example integers larger than 64 bits) fall back to the standard
+# library, so both implementations accept the same input.
+#
+
+if has_orjson:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def json_loads(data: str | bytes | bytearray | memoryview) -> Any:
+        """Load JSON data."""
+        return orjson.loads(data)
+
+    def json_dumpb(data: SerializableValue) -> bytes:
+        """Dump JSON data as UTF-8 encoded bytes."""
+        try:
+            return orjson.dumps(data, option=ORJSON_OPTIONS)
+        except TypeError:
+            return json.dumps(data).encode("utf-8")
+
+    def json_dumps(data: SerializableValue) -> str:
+        """Dump JSON data."""
+        return json_dumpb(data).decode("utf-8")
 
-def json_loads(data: str | bytes) -> Any:
-    """Load JSON data."""
-    return json.loads(data)
+else:
 
+    def json_loads(data: str | bytes | bytearray | memoryview) -> Any:
+        """Load JSON data."""
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
 
-def json_dumps(data: SerializableValue) -> str:
-    """Dump JSON data."""
-    return json.dumps(data)
+    def json_dumpb(data: SerializableValue) -> bytes:
+        """Dump JSON data as UTF-8 encoded bytes."""
+        return json.dumps(data).encode("utf-8")
+
+    def json_dumps(data: SerializableValue) -> str:
+        """Dump JSON data."""
+        return json.dumps(data)
 
 
 def hash_data(data: SerializableValue) -> str:
     """Create a SHA-256 hash from arbitrary (json-serializable) data."""
     if not isinstance(data, str):
-        data = json_dumps(data)
+        # Always use the standard library here, hashes must not
+        # depend on the installed JSON implementation
+        data = json.dumps(data)
     return hashlib.sha256(data.encode("utf-8")).hexdigest()
 
 
+def copy_value(value: Any) -> Any:
+    """Copy a JSON-like value, so it may be modified independently.
+
+    Only lists and dicts are copied, other values are assumed
+    to be immutable. This is several times faster than copy.deepcopy.
+    """
+    if isinstance(value, dict):
+        return {key: copy_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [copy_value(item) for item in value]
+    return value
+
+
+def copy_meta(meta: dict[str, Any]) -> dict[str, Any]:
+    """Copy a metadata dict, so it may be modified independently."""
+    return {
+        key: copy_value(value) if isinstance(value, dict | list) else value
+        for key, value in meta.items()
+    }
+
+
 def create_hash() -> str:
     """Create a pseudo-random hash (used as and access token)."""
     return hash_data([time.time(), random.random()])  # noqa: S311
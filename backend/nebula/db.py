@@ -6,10 +6,25 @@ from typing import Any
 import asyncpg
 import asyncpg.pool
 
-from nebula.common import json_dumps, json_loads
+from nebula.common import json_dumpb, json_loads
 from nebula.config import config
 from nebula.exceptions import NebulaException
 
+# Binary representation of JSONB is the JSON text prefixed
+# with a format version byte. Using it saves asyncpg decoding
+# the payload to str before it is parsed.
+JSONB_VERSION = b"\x01"
+
+
+def encode_jsonb(value: Any) -> bytes:
+    return JSONB_VERSION + json_dumpb(value)
+
+
+def decode_jsonb(data: bytes) -> Any:
+    if data[:1] != JSONB_VERSION:
+        raise ValueError(f"Unsupported JSONB format version {data[:1]!r}")
+    return json_loads(memoryview(data)[1:])
+
 
 class DB:
     _pool: asyncpg.pool.Pool | None = None
@@ -17,9 +32,10 @@ class DB:
     async def init_connection(self, conn) -> None:  # type: ignore
         await conn.set_type_codec(
             "jsonb",
-            encoder=json_dumps,
-            decoder=json_loads,
+            encoder=encode_jsonb,
+            decoder=decode_jsonb,
             schema="pg_catalog",
+            format="binary",
         )
 
     async def connect(self) -> None:
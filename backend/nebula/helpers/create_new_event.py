@@ -44,90 +44,153 @@ class EventData(BaseModel):
     )
 
 
-async def _create_new_event(
+async def _create_new_events(
     channel: PlayoutChannelSettings,
-    event_data: EventData,
+    events_data: list[EventData],
     user: nebula.User | None,
     conn: DatabaseConnection,
-) -> None:
-    """Create a new event from the given data."""
-
+    notify: bool,
+) -> list[nebula.Event]:
     username = user.name if user else None
 
-    new_bin = nebula.Bin(connection=conn, username=username)
-    new_event = nebula.Event(connection=conn, username=username)
-
-    await new_bin.save()
-
-    new_bin["duration"] = 0
-    new_event["id_magic"] = new_bin.id
-    new_event["id_channel"] = channel.id
-    new_event["start"] = event_data.start
-
-    asset_meta = {}
-    position = 0
-    if event_data.id_asset:
-        asset = await nebula.Asset.load(
-            event_data.id_asset, connection=conn, username=username
-        )
-
-        new_event["id_asset"] = event_data.id_asset
+    # Load referenced assets and existing items at once
 
-        new_item = nebula.Item(connection=conn, username=username)
-        new_item["id_asset"] = event_data.id_asset
-        new_item["id_bin"] = new_bin.id
-        new_item["position"] = position
-        new_item["mark_in"] = asset["mark_in"]
-        new_item["mark_out"] = asset["mark_out"]
-
-        await new_item.save()
-        new_bin["duration"] = asset.duration
-        asset_meta = asset.meta
-        position += 1
-
-    if event_data.items:
-        for item_data in event_data.items:
+    asset_ids: set[int] = set()
+    item_ids: set[int] = set()
+    for event_data in events_data:
+        if event_data.id_asset:
+            asset_ids.add(event_data.id_asset)
+        for item_data in event_data.items or []:
             if item_data.get("id"):
                 assert isinstance(item_data["id"], int), "Invalid item ID"
-                item = await nebula.Item.load(
-                    item_data["id"], connection=conn, username=username
-                )
+                item_ids.add(item_data["id"])
+            if isinstance(id_asset := item_data.get("id_asset"), int):
+                asset_ids.add(id_asset)
+
+    assets = {
+        asset.id: asset
+        for asset in await nebula.Asset.load_many(
+            list(asset_ids), connection=conn, username=username
+        )
+    }
+    if missing_assets := asset_ids - set(assets):
+        raise nebula.NotFoundException(f"Assets {sorted(missing_assets)} not found")
+
+    existing_items = {
+        item.id: item
+        for item in await nebula.Item.load_many(
+            list(item_ids), connection=conn, username=username
+        )
+    }
+    if missing_items := item_ids - set(existing_items):
+        raise nebula.NotFoundException(f"Items {sorted(missing_items)} not found")
+
+    # Build the objects
+
+    new_bins: list[nebula.Bin] = []
+    new_events: list[nebula.Event] = []
+    bin_items: list[list[nebula.Item]] = []
+
+    for event_data in events_data:
+        new_bin = nebula.Bin(connection=conn, username=username)
+        new_event = nebula.Event(connection=conn, username=username)
+        items: list[nebula.Item] = []
+
+        new_bin["duration"] = 0
+        new_event["id_channel"] = channel.id
+        new_event["start"] = event_data.start
+
+        asset_meta = {}
+        if event_data.id_asset:
+            asset = assets[event_data.id_asset]
+            new_event["id_asset"] = event_data.id_asset
+
+            new_item = nebula.Item(connection=conn, username=username)
+            new_item["id_asset"] = event_data.id_asset
+            new_item["mark_in"] = asset["mark_in"]
+            new_item["mark_out"] = asset["mark_out"]
+            items.append(new_item)
+
+            new_bin["duration"] = asset.duration
+            asset_meta = asset.meta
+
+        for item_data in event_data.items or []:
+            if isinstance(id_item := item_data.get("id"), int):
+                item = existing_items[id_item]
             else:
                 item = nebula.Item(connection=conn, username=username)
             item.update(item_data)
-            item["id_bin"] = new_bin.id
-            item["position"] = position
+            if (id_asset := item["id_asset"]) and id_asset in assets:
+                item.asset = assets[id_asset]
             new_bin["duration"] += item.duration
-            await item.save()
-            position += 1
+            items.append(item)
 
-    for field in channel.fields:
-        if (value := asset_meta.get(field.name)) is not None:
-            new_event[field.name] = value
-
-        if event_data.meta is not None:
-            value = event_data.meta.get(field.name)
-            if value is not None:
+        for field in channel.fields:
+            if (value := asset_meta.get(field.name)) is not None:
                 new_event[field.name] = value
 
+            if event_data.meta is not None:
+                value = event_data.meta.get(field.name)
+                if value is not None:
+                    new_event[field.name] = value
+
+        new_bins.append(new_bin)
+        new_events.append(new_event)
+        bin_items.append(items)
+
+    # Store the objects. Bins are saved first to get their IDs
+
+    all_items: list[nebula.Item] = []
     try:
-        await new_event.save()
-        await new_bin.save()
+        await nebula.Bin.save_many(new_bins, connection=conn, notify=notify)
+        for new_bin, new_event, items in zip(
+            new_bins, new_events, bin_items, strict=True
+        ):
+            new_event["id_magic"] = new_bin.id
+            for position, item in enumerate(items):
+                item["id_bin"] = new_bin.id
+                item["position"] = position
+            all_items.extend(items)
+        await nebula.Item.save_many(all_items, connection=conn, notify=notify)
+        await nebula.Event.save_many(new_events, connection=conn, notify=notify)
     except Exception as e:
         raise nebula.ConflictException() from e
 
+    return new_events
 
-async def create_new_event(
+
+async def create_new_events(
     channel: PlayoutChannelSettings,
-    event_data: EventData,
+    events_data: list[EventData],
     user: nebula.User | None = None,
     conn: DatabaseConnection | None = None,
-) -> None:
-    """Create a new event from the given data."""
+    notify: bool = False,
+) -> list[nebula.Event]:
+    """Create new events from the given data.
+
+    Referenced assets and items are loaded using a single query
+    for all events and the new objects are stored using save_many,
+    so the number of queries does not depend on the number of events.
+
+    Unless notify is set, no notifications are sent. Callers are
+    expected to send one message for the returned events.
+    """
+    if not events_data:
+        return []
 
     if conn:
-        return await _create_new_event(channel, event_data, user, conn)
+        return await _create_new_events(channel, events_data, user, conn, notify)
 
     pool = await nebula.db.pool()
     async with pool.acquire() as conn, conn.transaction():
-        return await _create_new_event(channel, event_data, user, conn)
+        return await _create_new_events(channel, events_data, user, conn, notify)
+
+
+async def create_new_event(
+    channel: PlayoutChannelSettings,
+    event_data: EventData,
+    user: nebula.User | None = None,
+    conn: DatabaseConnection | None = None,
+) -> None:
+    """Create a new event from the given data."""
+    await create_new_events(channel, [event_data], user, conn, notify=True)
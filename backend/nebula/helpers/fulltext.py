@@ -0,0 +1,47 @@
+from nebula.enum import ObjectTypeId
+from nx.utils import slugify
+
+
+def get_search_tokens(query: str, min_length: int = 3) -> list[str]:
+    """Return a sorted list of words to search for.
+
+    Slugified words contain only ascii letters and digits,
+    so they are safe to be used in SQL queries.
+    """
+    return sorted(slugify(query, make_set=True, min_length=min_length))
+
+
+def build_search_query(
+    query: str | None,
+    object_type: ObjectTypeId = ObjectTypeId.ASSET,
+    min_length: int = 3,
+) -> str | None:
+    """Return a subquery matching objects containing all words of a query.
+
+    All words are resolved in a single pass over the ft table.
+    The subquery yields `ft_id` and `ft_rank` columns, where the rank
+    is the sum of the best matching word weight of each query term
+    (so a short term matching many words does not outweigh the others).
+    It may be joined to the objects table and used to sort the result
+    by relevance.
+
+    Returns None if the query does not contain any searchable words.
+    """
+    if not query:
+        return None
+    if not (tokens := get_search_tokens(query, min_length=min_length)):
+        return None
+
+    match = " OR ".join(f"value LIKE '{token}%'" for token in tokens)
+    having = " AND ".join(f"bool_or(value LIKE '{token}%')" for token in tokens)
+    rank = " + ".join(
+        f"COALESCE(MAX(weight) FILTER (WHERE value LIKE '{token}%'), 0)"
+        for token in tokens
+    )
+    return f"""
+        SELECT id AS ft_id, {rank} AS ft_rank
+        FROM ft
+        WHERE object_type = {object_type.value} AND ({match})
+        GROUP BY id
+        HAVING {having}
+    """
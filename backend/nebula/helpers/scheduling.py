@@ -1,7 +1,11 @@
 import datetime
+import time
 from typing import TYPE_CHECKING, Any
 
+from redis.exceptions import RedisError
+
 import nebula
+from nebula.objects.identity_map import evict_objects
 from nx.utils import datestr2ts, s2time
 
 if TYPE_CHECKING:
@@ -10,37 +14,127 @@ if TYPE_CHECKING:
 ItemRuns = dict[int, tuple[float, float]]
 
 
+BIN_REFRESH_NAMESPACE = "bin-refresh"
+BIN_REFRESH_QUEUE = "queue"
+
+# Durations of bins are computed using the same rules as Item.duration:
+# virtual items use their own duration, items with a mark out use their
+# marks and other items use the raw duration of their assets.
+
+BIN_REFRESH_QUERY = """
+    WITH durations AS (
+        SELECT
+            b.id,
+            COALESCE(SUM(
+                CASE
+                WHEN COALESCE(i.id_asset, 0) = 0
+                    THEN COALESCE((i.meta->>'duration')::FLOAT8, 0)
+                WHEN COALESCE((i.meta->>'mark_out')::FLOAT8, 0) <> 0
+                    THEN (i.meta->>'mark_out')::FLOAT8
+                        - COALESCE((i.meta->>'mark_in')::FLOAT8, 0)
+                ELSE COALESCE((a.meta->>'duration')::FLOAT8, 0)
+                END
+            ), 0) AS duration
+        FROM bins AS b
+        LEFT JOIN items AS i ON i.id_bin = b.id
+        LEFT JOIN assets AS a ON a.id = i.id_asset
+        WHERE b.id = ANY($1)
+        GROUP BY b.id
+    ),
+
+    updated AS (
+        UPDATE bins AS b
+        SET meta = COALESCE(b.meta, '{}'::JSONB)
+            || jsonb_build_object('duration', d.duration, 'mtime', $2::FLOAT8)
+            || $3::JSONB
+        FROM durations AS d
+        WHERE b.id = d.id
+        AND abs(COALESCE((b.meta->>'duration')::FLOAT8, 0) - d.duration) > 0.0001
+        RETURNING b.id, d.duration
+    )
+
+    SELECT 'bin' AS object_type, id, duration FROM updated
+    UNION ALL
+    SELECT 'event' AS object_type, e.id, NULL AS duration
+    FROM events AS e
+    JOIN channels AS c ON c.id = e.id_channel
+    WHERE c.channel_type = 0 AND e.id_magic = ANY($1)
+"""
+
+
 async def bin_refresh(
     bins: list[int],
     initiator: str | None = None,
     user: nebula.User | None = None,
 ) -> None:
+    """Update durations of the given bins and notify clients about the change
+
+    Durations of all bins are computed and stored using a single query.
+    Only bins which duration has changed are updated, but the notification
+    is sent for all of them (as their items might have changed).
+
+    The refresh is done immediately. Use `enqueue_bin_refresh` when
+    the caller does not need the new durations.
+    """
+    await refresh_bins(
+        bins,
+        initiator=initiator,
+        id_user=user.id if user else None,
+        username=user.name if user else None,
+    )
+
+
+async def enqueue_bin_refresh(
+    bins: list[int],
+    initiator: str | None = None,
+    user: nebula.User | None = None,
+) -> None:
+    """Request a refresh of the given bins from the bin refresh queue
+
+    Requests are merged over a short period of time and each bin
+    is refreshed only once (see server/bin_refresh_queue.py).
+    When the queue is not available, bins are refreshed immediately.
+    """
+    if not bins:
+        return
+    id_user = user.id if user else 0
+    try:
+        await nebula.redis.sadd(
+            BIN_REFRESH_NAMESPACE,
+            BIN_REFRESH_QUEUE,
+            *[f"{id_bin}:{id_user}:{initiator or ''}" for id_bin in bins],
+        )
+    except (ConnectionError, RedisError):
+        nebula.log.warn("Bin refresh queue is not available")
+        await bin_refresh(bins, initiator=initiator, user=user)
+
+
+async def refresh_bins(
+    bins: list[int],
+    initiator: str | None = None,
+    id_user: int | None = None,
+    username: str | None = None,
+) -> None:
+    """Update durations of bins and send the notifications (see bin_refresh)"""
     if not bins:
         return None
 
-    username = user.name if user else None
-
-    for id_bin in bins:
-        # Resave bin to update duration
-        b = await nebula.Bin.load(id_bin, username=username)
-        await b.get_items()
-        if user:
-            b["updated_by"] = user.id
-        # this log message triggers storing bin duration to its meta
-        nebula.log.trace(
-            f"New duration of {b} is {s2time(b.duration)} ({len(b.items)} items)",
-            user=username,
-        )
-        await b.save(notify=False)
+    patch = {"updated_by": id_user} if id_user else {}
+
+    changed_bins: list[int] = []
+    changed_events: list[int] = []
+    for row in await nebula.db.fetch(BIN_REFRESH_QUERY, bins, time.time(), patch):
+        if row["object_type"] == "bin":
+            changed_bins.append(row["id"])
+            nebula.log.trace(
+                f"New duration of bin ID {row['id']} is {s2time(row['duration'])}",
+                user=username,
+            )
+        else:
+            changed_events.append(row["id"])
+
+    evict_objects("bin", changed_bins)
 
-    query = """
-    SELECT DISTINCT(c.id) AS id_event FROM events as e, channels AS c
-    WHERE
-        c.channel_type = 0 AND
-        c.id = e.id_channel AND
-        e.id_magic = ANY($1)
-    """
-    changed_events = [row["id_event"] async for row in nebula.db.iterate(query, bins)]
     await nebula.msg(
         "objects_changed",
         object_type="bin",
@@ -81,6 +175,22 @@ async def get_pending_assets(send_action: int | None) -> list[int]:
     return pending_assets
 
 
+async def get_pending_assets_by_action(
+    send_actions: list[int],
+) -> dict[int, set[int]]:
+    """Return assets that are pending for each of the given send actions"""
+    result: dict[int, set[int]] = {id_action: set() for id_action in send_actions}
+    if not send_actions:
+        return result
+    query = """
+        SELECT id_action, id_asset FROM jobs
+        WHERE id_action = ANY($1) AND status IN (0, 5)
+    """
+    async for row in nebula.db.iterate(query, send_actions):
+        result[row["id_action"]].add(row["id_asset"])
+    return result
+
+
 def parse_durations(
     ameta: dict[str, Any], imeta: dict[str, Any]
 ) -> tuple[float, float, float]:
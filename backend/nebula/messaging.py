@@ -1,15 +1,15 @@
-import json
 import socket
 import time
 from typing import Any
 
+from nebula.common import json_dumpb
 from nebula.config import config
 from nebula.redis import Redis
 
 
 async def msg(topic: str, **data: Any) -> None:
     await Redis.publish(
-        json.dumps(
+        json_dumpb(
             [
                 time.time(),
                 config.site_name,
@@ -1,8 +1,10 @@
+import copy
 import time
 from typing import Any, TypeVar
 
 import asyncpg
 
+from nebula.common import hash_data, json_dumpb
 from nebula.db import DB, DatabaseConnection, db
 from nebula.enum import ObjectTypeId
 from nebula.exceptions import (
@@ -14,6 +16,7 @@ from nebula.log import log
 from nebula.messaging import msg
 from nebula.metadata.format import format_meta
 from nebula.metadata.normalize import normalize_meta
+from nebula.objects.identity_map import evict_objects, get_identity_map
 from nebula.settings import settings
 from nx.utils import slugify
 
@@ -50,6 +53,125 @@ def create_ft_index(meta: dict[str, Any]) -> dict[str, float]:
     return ft
 
 
+def nested_fingerprint(value: Any) -> Any:
+    """Return a snapshot of a nested value used to detect its changes"""
+    try:
+        return json_dumpb(value)
+    except TypeError:
+        # Not JSON-serializable
+        return copy.deepcopy(value)
+
+
+def ft_fingerprint(ft: dict[str, float]) -> str:
+    """Return a hash of the full-text index of an object."""
+    return hash_data(sorted(ft.items()))
+
+
+async def save_ft_index(
+    connection: DatabaseConnection,
+    object_type_id: int,
+    indexes: list[tuple[int, dict[str, float], bool]],
+) -> None:
+    """Store full-text indexes of the given objects.
+
+    indexes is a list of (object_id, ft_index, is_new) tuples.
+    Objects whose index fingerprint matches the stored one are skipped.
+    Existing rows of the other objects are compared with the new index,
+    so only changed (word, weight) pairs are deleted and inserted.
+    """
+    if not indexes:
+        return
+
+    fingerprints = {id: ft_fingerprint(ft) for id, ft, _ in indexes}
+    existing_ids = [id for id, _, is_new in indexes if not is_new]
+
+    # Objects with the same fingerprint have unchanged index rows
+
+    if existing_ids:
+        query = """
+            SELECT id, fingerprint FROM ft_fingerprints
+            WHERE object_type = $1 AND id = ANY($2)
+        """
+        unchanged = {
+            row["id"]
+            for row in await connection.fetch(query, object_type_id, existing_ids)
+            if row["fingerprint"] == fingerprints[row["id"]]
+        }
+        if unchanged:
+            indexes = [index for index in indexes if index[0] not in unchanged]
+            existing_ids = [id for id in existing_ids if id not in unchanged]
+            if not indexes:
+                return
+
+    current: dict[int, dict[str, list[int]]] = {}
+    if existing_ids:
+        query = """
+            SELECT id, value, weight FROM ft
+            WHERE object_type = $1 AND id = ANY($2)
+        """
+        for row in await connection.fetch(query, object_type_id, existing_ids):
+            words = current.setdefault(row["id"], {})
+            words.setdefault(row["value"], []).append(row["weight"])
+
+    del_ids: list[int] = []
+    del_values: list[str] = []
+    ins_ids: list[int] = []
+    ins_weights: list[int] = []
+    ins_values: list[str] = []
+
+    for id, ft, _ in indexes:
+        old_words = current.get(id, {})
+        for word, weights in old_words.items():
+            if word not in ft or weights != [int(ft[word])]:
+                del_ids.append(id)
+                del_values.append(word)
+        for word, weight in ft.items():
+            if old_words.get(word) != [int(weight)]:
+                ins_ids.append(id)
+                ins_weights.append(int(weight))
+                ins_values.append(word)
+
+    if del_ids:
+        await connection.execute(
+            """
+            DELETE FROM ft WHERE object_type = $1
+            AND (id, value) IN (
+                SELECT * FROM unnest($2::INTEGER[], $3::VARCHAR[])
+            )
+            """,
+            object_type_id,
+            del_ids,
+            del_values,
+        )
+
+    if ins_ids:
+        await connection.execute(
+            """
+            INSERT INTO ft (id, object_type, weight, value)
+            SELECT id, $2, weight, value
+            FROM unnest($1::INTEGER[], $3::INTEGER[], $4::VARCHAR[])
+            AS t(id, weight, value)
+            """,
+            ins_ids,
+            object_type_id,
+            ins_weights,
+            ins_values,
+        )
+
+    await connection.execute(
+        """
+        INSERT INTO ft_fingerprints (object_type, id, fingerprint)
+        SELECT $1, id, fingerprint
+        FROM unnest($2::INTEGER[], $3::VARCHAR[]) AS t(id, fingerprint)
+        ON CONFLICT (object_type, id) DO UPDATE
+        SET fingerprint = EXCLUDED.fingerprint
+        """,
+        object_type_id,
+        [id for id, _, _ in indexes],
+        [fingerprints[id] for id, _, _ in indexes],
+    )
+
+
 class BaseObject:
     object_type: str
     meta: dict[str, Any] = {}
@@ -58,6 +180,13 @@ class BaseObject:
     connection: DatabaseConnection | None = None
     username: str | None = None  # Name of the user operating on the object
 
+    # Metadata as it was stored in the database when the object
+    # was created or last saved, snapshots of its nested values,
+    # and keys explicitly set since then.
+    _saved_meta: dict[str, Any]
+    _saved_nested: dict[str, Any]
+    _touched_keys: set[str]
+
     def __init__(
         self,
         meta: dict[str, Any] | None = None,
@@ -75,6 +204,7 @@ class BaseObject:
         if meta is None:
             meta = {}
         self.meta = self.defaults | meta
+        self._reset_changes()
 
     def __repr__(self) -> str:
         return f"<{self.__str__().capitalize()}>"
@@ -131,8 +261,11 @@ class BaseObject:
             raise ValidationException(str(e), key=key) from e
         if value is None:
             self.meta.pop(key, None)
-        else:
-            self.meta[key] = value
+            return
+        if isinstance(value, dict | list) and value is self.meta.get(key):
+            # Same object may have been modified in place
+            self._touched_keys.add(key)
+        self.meta[key] = value
 
     def get(self, key: str, default: Any = None) -> Any:
         if (value := self[key]) is None and (key != "id"):
@@ -147,6 +280,50 @@ class BaseObject:
         for key, value in meta.items():
             self[key] = value
 
+    #
+    # Change tracking
+    #
+
+    def _reset_changes(self) -> None:
+        # Nested values may be modified in place, so their snapshots
+        # are stored. Serializing them is cheaper than copying.
+        self._saved_meta = dict(self.meta)
+        self._saved_nested = {
+            key: nested_fingerprint(value)
+            for key, value in self.meta.items()
+            if isinstance(value, dict | list)
+        }
+        self._touched_keys = set()
+
+    @property
+    def changed_keys(self) -> set[str]:
+        """Return keys which were added or modified since the last save."""
+        result = {key for key in self._touched_keys if key in self.meta}
+        for key, value in self.meta.items():
+            if key not in self._saved_meta:
+                result.add(key)
+                continue
+            if key in self._saved_nested:
+                if nested_fingerprint(value) != self._saved_nested[key]:
+                    result.add(key)
+                continue
+            saved_value = self._saved_meta[key]
+            if value is not saved_value and value != saved_value:
+                result.add(key)
+        return result
+
+    @property
+    def removed_keys(self) -> set[str]:
+        """Return keys which were removed since the last save."""
+        return {key for key in self._saved_meta if key not in self.meta}
+
+    @property
+    def is_changed(self) -> bool:
+        """Return True if the object needs to be saved."""
+        if self.id is None:
+            return True
+        return bool(self.changed_keys or self.removed_keys)
+
     #
     # Factory methods
     # TODO: after upgrading to Python 3.11, use 'self' as a return type
@@ -159,13 +336,60 @@ class BaseObject:
         connection: DatabaseConnection | None = None,
         username: str | None = None,
     ) -> T:
-        """Load an object from the database"""
+        """Load an object from the database
+
+        When an identity map is active, the object is loaded from it
+        and the database is queried only on the first access.
+        """
+        identity_map = get_identity_map()
+        if identity_map and (meta := identity_map.get(cls.object_type, id)):
+            return cls(meta=meta, connection=connection, username=username)
+
         conn = connection or db
         res = await conn.fetch(f"SELECT meta FROM {cls.object_type}s WHERE id = $1", id)
         if not res:
             raise NotFoundException(f"{cls.object_type.capitalize()} ID {id} not found")
+        if identity_map is not None:
+            identity_map.set(cls.object_type, id, res[0]["meta"])
         return cls(meta=res[0]["meta"], connection=connection, username=username)
 
+    @classmethod
+    async def load_many(
+        cls: type[T],
+        ids: list[int],
+        connection: DatabaseConnection | None = None,
+        username: str | None = None,
+    ) -> list[T]:
+        """Load multiple objects from the database using a single query
+
+        Objects are returned in the order of the requested ids.
+        Non-existent ids are skipped. Objects already present
+        in the active identity map are not queried.
+        """
+        identity_map = get_identity_map()
+        metas: dict[int, dict[str, Any]] = {}
+        missing: list[int] = []
+        for id in dict.fromkeys(ids):
+            if identity_map and (meta := identity_map.get(cls.object_type, id)):
+                metas[id] = meta
+                continue
+            missing.append(id)
+
+        if missing:
+            conn = connection or db
+            query = f"SELECT id, meta FROM {cls.object_type}s WHERE id = ANY($1)"
+            for row in await conn.fetch(query, missing):
+                if identity_map is not None:
+                    identity_map.set(cls.object_type, row["id"], row["meta"])
+                metas[row["id"]] = row["meta"]
+
+        result: list[T] = []
+        for id in ids:
+            if (meta := metas.get(id)) is None:
+                continue
+            result.append(cls(meta=meta, connection=connection, username=username))
+        return result
+
     @classmethod
     def from_row(
         cls: type[T],
@@ -232,6 +456,7 @@ class BaseObject:
             assert isinstance(self.connection, asyncpg.Connection)
             async with self.connection.transaction():
                 await self._delete()
+        evict_objects(self.object_type, [self.id])
 
     async def _delete(self) -> None:
         assert self.connection is not None
@@ -244,12 +469,20 @@ class BaseObject:
             ObjectTypeId[self.object_type.upper()].value,
             self.id,
         )
+        await self.connection.execute(
+            "DELETE FROM ft_fingerprints WHERE object_type = $1 AND id = $2",
+            ObjectTypeId[self.object_type.upper()].value,
+            self.id,
+        )
 
     async def delete_children(self) -> None:
         pass
 
     async def save(self, notify: bool = True, initiator: str | None = None) -> None:
         assert self.connection is not None
+        if not self.is_changed:
+            log.trace(f"{self} has not changed. Not saving", user=self.username)
+            return
         if isinstance(self.connection, DB):
             pool = await self.connection.pool()
             async with pool.acquire() as conn, conn.transaction():
@@ -262,6 +495,9 @@ class BaseObject:
         else:
             async with self.connection.transaction():
                 await self._save()
+        self._reset_changes()
+        assert self.id is not None
+        evict_objects(self.object_type, [self.id])
         if notify:
             await msg(
                 "objects_changed",
@@ -273,63 +509,215 @@ class BaseObject:
 
     async def _save(self) -> None:
         assert self.connection is not None
-        if self.id is None:
+        is_new = self.id is None
+        ft = self._prepare_ft_index(force=is_new)
+        if is_new:
             await self._insert()
         else:
-            await self.connection.execute(
-                "DELETE FROM ft WHERE object_type = $1 AND id = $2",
-                ObjectTypeId[self.object_type.upper()].value,
-                self.id,
-            )
-        ft_payloads = [
-            (
-                self.id,
+            await self._update()
+        if ft is not None:
+            assert self.id is not None
+            await save_ft_index(
+                self.connection,
                 ObjectTypeId[self.object_type.upper()].value,
-                weight,
-                word,
+                [(self.id, ft, is_new)],
             )
-            for word, weight in create_ft_index(self.meta).items()
-        ]
 
-        await self.connection.executemany(
-            """
-            INSERT INTO ft (id, object_type, weight, value)
-            VALUES ($1, $2, $3, $4)
-            """,
-            ft_payloads,
-        )
-        await self._update()
+    def _prepare_ft_index(self, force: bool = False) -> dict[str, float] | None:
+        """Return a new full-text index of the object if it needs to be stored.
+
+        Returns None when no full-text field was changed since the last save.
+        """
+        if not force:
+            for key in self.changed_keys | self.removed_keys:
+                if key == "subclips":
+                    break
+                if key in settings.metatypes and settings.metatypes[key].fulltext:
+                    break
+            else:
+                return None
+
+        return create_ft_index(self.meta)
 
     async def _insert(self) -> None:
         assert self.connection is not None
-        self.meta["ctime"] = self.meta["mtime"] = time.time()
-        placeholders = ", ".join(
-            ["$" + str(i) for i in range(1, len(self.db_columns) + 2)]
+        res = await self.connection.fetch(
+            "SELECT nextval(pg_get_serial_sequence($1, 'id')) AS id",
+            f"{self.object_type}s",
         )
+        self.meta["id"] = res[0]["id"]
+        self.meta["ctime"] = self.meta["mtime"] = time.time()
+
+        columns = ["id", *self.db_columns]
+        placeholders = ", ".join(f"${i}" for i in range(1, len(columns) + 2))
         query = f"""
-            INSERT INTO {self.object_type}s ({",".join(self.db_columns)}, meta)
-            VALUES ({placeholders}) RETURNING id
+            INSERT INTO {self.object_type}s ({", ".join(columns)}, meta)
+            VALUES ({placeholders})
             """
-        qargs = [self.meta[col] for col in self.db_columns] + [self.meta]
+        qargs = [self.meta[col] for col in columns] + [self.meta]
+        await self.connection.execute(query, *qargs)
 
-        res = await self.connection.fetch(query, *qargs)
-        self.meta["id"] = res[0]["id"]
+    def _get_patch(self) -> tuple[list[str], dict[str, Any], list[str]]:
+        """Return changed database columns, metadata patch and removed keys."""
+        changed_keys = self.changed_keys
+        removed_keys = self.removed_keys
+        columns = [
+            col for col in self.db_columns if col in changed_keys or col in removed_keys
+        ]
+        patch = {key: self.meta[key] for key in changed_keys}
+        return columns, patch, sorted(removed_keys)
 
     async def _update(self) -> None:
+        """Store changed keys of the object.
+
+        Only modified database columns are updated and
+        the stored metadata is patched instead of replaced.
+        """
         assert self.connection is not None
         self.meta["mtime"] = time.time()
-        upcols = ", ".join(
-            [col + " = $" + str(i) for i, col in enumerate(self.db_columns, 1)]
-        )
+        columns, patch, removed_keys = self._get_patch()
+        upcols = "".join(f"{col} = ${i}, " for i, col in enumerate(columns, 1))
         query = f"""
             UPDATE {self.object_type}s
-            SET {upcols},
-            meta=${len(self.db_columns) + 1}
-            WHERE id = ${len(self.db_columns) + 2}
+            SET {upcols}
+            meta = (COALESCE(meta, '{{}}'::JSONB) - ${len(columns) + 1}::TEXT[])
+                || ${len(columns) + 2}::JSONB
+            WHERE id = ${len(columns) + 3}
             """
 
-        qargs = [self.meta[col] for col in self.db_columns] + [
-            self.meta,
+        qargs = [self.meta.get(col) for col in columns] + [
+            removed_keys,
+            patch,
             self.id,
         ]
         await self.connection.execute(query, *qargs)
+
+    #
+    # Bulk saving
+    #
+
+    @classmethod
+    async def save_many(
+        cls: type[T],
+        objects: list[T],
+        connection: DatabaseConnection | None = None,
+        notify: bool = True,
+        initiator: str | None = None,
+    ) -> None:
+        """Save a list of objects of the same type in one transaction.
+
+        IDs of new objects are allocated using a single sequence query,
+        rows are written using pipelined statements and the full-text
+        index of the whole batch is updated at once. When notify is set,
+        one objects_changed message is sent for all saved objects.
+        Objects which were not changed since they were loaded are skipped.
+        """
+        for obj in objects:
+            assert isinstance(obj, cls), f"Unable to save {obj} as {cls.object_type}"
+        objects = [obj for obj in objects if obj.is_changed]
+        if not objects:
+            return
+
+        conn = connection or db
+        if isinstance(conn, DB):
+            pool = await conn.pool()
+            async with pool.acquire() as pconn, pconn.transaction():
+                await cls._save_many(objects, pconn)
+        elif hasattr(conn, "is_in_transaction") and conn.is_in_transaction():
+            await cls._save_many(objects, conn)
+        else:
+            async with conn.transaction():
+                await cls._save_many(objects, conn)
+
+        for obj in objects:
+            obj._reset_changes()
+        evict_objects(cls.object_type, [obj.meta["id"] for obj in objects])
+
+        if notify:
+            await msg(
+                "objects_changed",
+                object_type=cls.object_type,
+                objects=[obj.id for obj in objects],
+                initiator=initiator,
+            )
+        log.info(
+            f"Saved {len(objects)} {cls.object_type}s",
+            user=objects[0].username,
+        )
+
+    @classmethod
+    async def _save_many(
+        cls: type[T],
+        objects: list[T],
+        conn: asyncpg.pool.PoolConnectionProxy,
+    ) -> None:
+        object_type_id = ObjectTypeId[cls.object_type.upper()].value
+        now = time.time()
+
+        new_objects = [obj for obj in objects if obj.id is None]
+        existing_objects = [obj for obj in objects if obj.id is not None]
+        ft_indexes = [
+            (obj, obj.id is None, obj._prepare_ft_index(force=obj.id is None))
+            for obj in objects
+        ]
+
+        if new_objects:
+            res = await conn.fetch(
+                """
+                SELECT nextval(pg_get_serial_sequence($1, 'id')) AS id
+                FROM generate_series(1, $2)
+                """,
+                f"{cls.object_type}s",
+                len(new_objects),
+            )
+            for obj, row in zip(new_objects, res, strict=True):
+                obj.meta["id"] = row["id"]
+                obj.meta["ctime"] = obj.meta["mtime"] = now
+
+            columns = ["id", *cls.db_columns]
+            placeholders = ", ".join(f"${i}" for i in range(1, len(columns) + 2))
+            await conn.executemany(
+                f"""
+                INSERT INTO {cls.object_type}s ({", ".join(columns)}, meta)
+                VALUES ({placeholders})
+                """,
+                [
+                    [obj.meta[col] for col in columns] + [obj.meta]
+                    for obj in new_objects
+                ],
+            )
+
+        # Objects are grouped by the set of changed database columns,
+        # so every group is written using a single statement
+
+        updates: dict[tuple[str, ...], list[list[Any]]] = {}
+        for obj in existing_objects:
+            obj.meta["mtime"] = now
+            columns, patch, removed_keys = obj._get_patch()
+            qargs = [obj.meta.get(col) for col in columns]
+            updates.setdefault(tuple(columns), []).append(
+                [*qargs, removed_keys, patch, obj.id]
+            )
+
+        for upcolumns, args in updates.items():
+            upcols = "".join(f"{col} = ${i}, " for i, col in enumerate(upcolumns, 1))
+            await conn.executemany(
+                f"""
+                UPDATE {cls.object_type}s
+                SET {upcols}
+                meta = (COALESCE(meta, '{{}}'::JSONB) - ${len(upcolumns) + 1}::TEXT[])
+                    || ${len(upcolumns) + 2}::JSONB
+                WHERE id = ${len(upcolumns) + 3}
+                """,
+                args,
+            )
+
+        await save_ft_index(
+            conn,
+            object_type_id,
+            [
+                (obj.meta["id"], ft, is_new)
+                for obj, is_new, ft in ft_indexes
+                if ft is not None
+            ],
+        )
@@ -0,0 +1,72 @@
+"""Request-scoped identity map of loaded objects.
+
+When an identity map is active (API requests activate one for their
+whole lifetime), BaseObject.load and BaseObject.load_many look up
+the requested objects in the map first and only query the database
+for the missing ones. Repeated loads of the same object within one
+request then cost no database round trip.
+
+The map stores metadata as it was loaded from the database. Every
+object created from the map gets its own copy of the metadata,
+so modifying an object never affects the cached state. Saved and
+deleted objects are evicted from the map.
+
+Outside of an active scope (CLI scripts, background tasks),
+objects are always loaded from the database.
+"""
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from nebula.common import copy_meta
+
+
+class IdentityMap:
+    def __init__(self) -> None:
+        self.data: dict[tuple[str, int], dict[str, Any]] = {}
+
+    def get(self, object_type: str, id: int) -> dict[str, Any] | None:
+        """Return a copy of the cached metadata of an object or None"""
+        if (meta := self.data.get((object_type, id))) is None:
+            return None
+        return copy_meta(meta)
+
+    def set(self, object_type: str, id: int, meta: dict[str, Any]) -> None:
+        self.data[(object_type, id)] = copy_meta(meta)
+
+    def evict(self, object_type: str, ids: list[int]) -> None:
+        for id in ids:
+            self.data.pop((object_type, id), None)
+
+
+_identity_map: ContextVar[IdentityMap | None] = ContextVar(
+    "identity_map",
+    default=None,
+)
+
+
+def get_identity_map() -> IdentityMap | None:
+    """Return the identity map of the current scope (if any)"""
+    return _identity_map.get()
+
+
+def evict_objects(object_type: str, ids: list[int]) -> None:
+    """Remove objects from the identity map of the current scope.
+
+    Call this after modifying objects using raw SQL queries.
+    """
+    if (identity_map := _identity_map.get()) is not None:
+        identity_map.evict(object_type, ids)
+
+
+@contextmanager
+def identity_map_scope() -> Iterator[IdentityMap]:
+    """Activate a new identity map for the current context"""
+    identity_map = IdentityMap()
+    token = _identity_map.set(identity_map)
+    try:
+        yield identity_map
+    finally:
+        _identity_map.reset(token)
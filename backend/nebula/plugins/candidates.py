@@ -0,0 +1,245 @@
+"""Cached pool of assets solvers pick from.
+
+Solvers usually fill many placeholders in a row from the same library
+subset. Instead of querying the assets table for each placeholder, the
+fields solvers filter by (folder, genre and duration) of the online file
+assets are loaded once into a table shared by all channels, and the time
+each asset was last broadcasted is loaded per channel. Candidates are
+filtered in memory.
+
+Changed assets are reloaded in the shared table when an `objects_changed`
+message is received. Tables older than the TTL are reloaded, which also
+updates the last-aired information.
+"""
+
+import time
+from collections.abc import Iterable
+from typing import Any
+
+import nebula
+from nebula.enum import MediaType, ObjectStatus
+
+
+class Candidate:
+    """Asset which may be used by a solver"""
+
+    __slots__ = ("id", "id_folder", "genre", "duration")
+
+    def __init__(
+        self,
+        id: int,
+        id_folder: int,
+        genre: str | None = None,
+        duration: float = 0,
+    ) -> None:
+        self.id = id
+        self.id_folder = id_folder
+        self.genre = genre
+        self.duration = duration
+
+    def __repr__(self) -> str:
+        return f"<Candidate {self.id} ({self.duration:.2f}s)>"
+
+    async def load(self) -> nebula.Asset:
+        """Load the asset of the candidate"""
+        return await nebula.Asset.load(self.id)
+
+
+class CandidateTable:
+    """Candidates of all channels"""
+
+    def __init__(self, candidates: Iterable[Candidate]) -> None:
+        self.loaded_at = time.time()
+        self.candidates: dict[int, Candidate] = {}
+        self.by_folder: dict[int, dict[int, Candidate]] = {}
+        for candidate in candidates:
+            self.add(candidate)
+
+    def __len__(self) -> int:
+        return len(self.candidates)
+
+    def add(self, candidate: Candidate) -> None:
+        self.remove(candidate.id)
+        self.candidates[candidate.id] = candidate
+        self.by_folder.setdefault(candidate.id_folder, {})[candidate.id] = candidate
+
+    def remove(self, id_asset: int) -> None:
+        if (candidate := self.candidates.pop(id_asset, None)) is None:
+            return
+        self.by_folder.get(candidate.id_folder, {}).pop(id_asset, None)
+
+
+class ChannelPool:
+    """Candidates of a playout channel"""
+
+    def __init__(
+        self,
+        id_channel: int,
+        table: CandidateTable,
+        last_aired: dict[int, float],
+    ) -> None:
+        self.id_channel = id_channel
+        self.loaded_at = time.time()
+        self.table = table
+        self.last_aired = last_aired
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def __contains__(self, id_asset: int) -> bool:
+        return id_asset in self.table.candidates
+
+    def get(self, id_asset: int) -> Candidate | None:
+        return self.table.candidates.get(id_asset)
+
+    def filter(
+        self,
+        folders: list[int] | None = None,
+        genres: list[str] | None = None,
+        min_duration: float | None = None,
+        max_duration: float | None = None,
+        aired_before: float | None = None,
+        exclude: set[int] | None = None,
+    ) -> list[Candidate]:
+        """Return candidates matching all the given conditions.
+
+        `aired_before` keeps candidates which were not broadcasted
+        on the channel since the given time (including ones which
+        never aired). Result is ordered by the last-aired time,
+        oldest first.
+        """
+        if folders is None:
+            source: Iterable[Candidate] = self.table.candidates.values()
+        else:
+            source = [
+                candidate
+                for id_folder in folders
+                for candidate in self.table.by_folder.get(id_folder, {}).values()
+            ]
+
+        result: list[Candidate] = []
+        for candidate in source:
+            if exclude and candidate.id in exclude:
+                continue
+            if genres is not None and candidate.genre not in genres:
+                continue
+            if min_duration is not None and candidate.duration < min_duration:
+                continue
+            if max_duration is not None and candidate.duration > max_duration:
+                continue
+            if (
+                aired_before is not None
+                and (last_aired := self.last_aired.get(candidate.id)) is not None
+                and last_aired >= aired_before
+            ):
+                continue
+            result.append(candidate)
+        result.sort(key=lambda candidate: self.last_aired.get(candidate.id) or 0)
+        return result
+
+
+class CandidatePool:
+    ttl: int = 300
+
+    def __init__(self) -> None:
+        self.table: CandidateTable | None = None
+        self.channels: dict[int, ChannelPool] = {}
+        self.generation = 0
+
+    async def load(self, ids: list[int] | None = None) -> list[Candidate]:
+        """Load candidates (all of them or the given assets)"""
+        cond = "AND id = ANY($3)" if ids is not None else ""
+        query = f"""
+            SELECT
+                id,
+                id_folder,
+                meta->>'genre' AS genre,
+                (meta->>'duration')::FLOAT8 AS duration,
+                (meta->>'mark_in')::FLOAT8 AS mark_in,
+                (meta->>'mark_out')::FLOAT8 AS mark_out
+            FROM assets
+            WHERE status = $1 AND media_type = $2 {cond}
+        """
+        args: list[Any] = [ObjectStatus.ONLINE, MediaType.FILE]
+        if ids is not None:
+            args.append(ids)
+
+        result: list[Candidate] = []
+        async for row in nebula.db.iterate(query, *args):
+            # Same rules as Asset.duration
+            duration = row["duration"] or 0
+            if duration:
+                if mark_out := row["mark_out"]:
+                    duration = min(duration, mark_out)
+                if mark_in := row["mark_in"]:
+                    duration -= mark_in
+            result.append(
+                Candidate(row["id"], row["id_folder"], row["genre"], duration)
+            )
+        return result
+
+    async def load_last_aired(self, id_channel: int) -> dict[int, float]:
+        """Return the time of the last broadcast of assets on a channel"""
+        query = """
+            SELECT i.id_asset, max(al.start) AS last_aired
+            FROM asrun_latest AS al
+            JOIN items AS i ON i.id = al.id_item
+            WHERE al.id_channel = $1
+            GROUP BY i.id_asset
+        """
+        return {
+            row["id_asset"]: row["last_aired"]
+            async for row in nebula.db.iterate(query, id_channel)
+        }
+
+    async def get_table(self) -> CandidateTable:
+        """Return the shared candidate table. Load it if needed"""
+        table = self.table
+        if table is not None and time.time() - table.loaded_at < self.ttl:
+            return table
+
+        generation = self.generation
+        table = CandidateTable(await self.load())
+        nebula.log.debug(f"Loaded {len(table)} solver candidates")
+        # Do not store tables loaded while assets were changing.
+        # They may be outdated.
+        if generation == self.generation:
+            self.table = table
+        return table
+
+    async def get(self, id_channel: int) -> ChannelPool:
+        """Return candidates of a channel. Load them if needed"""
+        table = await self.get_table()
+        pool = self.channels.get(id_channel)
+        if (
+            pool is not None
+            and pool.table is table
+            and time.time() - pool.loaded_at < self.ttl
+        ):
+            return pool
+
+        pool = ChannelPool(id_channel, table, await self.load_last_aired(id_channel))
+        self.channels[id_channel] = pool
+        return pool
+
+    async def refresh(self, ids: list[int]) -> None:
+        """Reload the given assets in the shared table"""
+        self.generation += 1
+        if (table := self.table) is None:
+            return
+        candidates = await self.load(ids)
+        for id_asset in ids:
+            table.remove(id_asset)
+        for candidate in candidates:
+            table.add(candidate)
+
+    async def on_message(self, message: dict[str, Any]) -> None:
+        if message["topic"] != "objects_changed":
+            return
+        if message["data"].get("object_type") != "asset":
+            return
+        if ids := [int(id) for id in message["data"].get("objects") or []]:
+            await self.refresh(ids)
+
+
+candidate_pool = CandidatePool()
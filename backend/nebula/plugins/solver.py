@@ -1,16 +1,21 @@
 import nebula
-from nebula.helpers.scheduling import bin_refresh
+from nebula.helpers.scheduling import enqueue_bin_refresh
 from nx.utils import format_time
 
+from .candidates import ChannelPool, candidate_pool
 from .common import modules_root
 
 assert modules_root
 
+# First key of the advisory locks of solved events ("solv")
+EVENT_LOCK_CLASS = 0x736F6C76
+
 
 class SolverPlugin:
     name: str = "solver"
 
     affected_bins: list[int] = []
+    used_assets: set[int] = set()
     new_events: list[nebula.Event] = []
     new_items: list[nebula.Item] = []
 
@@ -27,13 +32,45 @@ class SolverPlugin:
 
     async def __call__(self, id_item: int) -> None:
         """Solver entrypoint."""
+        await self.solve_many([id_item])
+
+    async def solve_many(self, id_items: list[int]) -> None:
+        """Solve the given placeholders.
+
+        Placeholders created by splitting blocks are solved
+        in the same run. Durations of all affected bins are
+        refreshed once, after the last placeholder is solved.
+        """
+        await self.solve_placeholders(id_items)
+
+        # recalculate bin durations and notify clients about changes
+        await enqueue_bin_refresh(self.affected_bins)
+
+    async def solve_placeholders(self, id_items: list[int]) -> list[int]:
+        """Solve the given placeholders without refreshing bins.
+
+        Return IDs of the affected bins, which need to be refreshed
+        by the caller.
+        """
+        self.affected_bins = []
+        self.used_assets = set()
+        for id_item in id_items:
+            id_next: int | None = id_item
+            while id_next:
+                await self.load(id_next)
+                await self.main()
+                id_next = self._solve_next.id if self._solve_next else None
+        return self.affected_bins
+
+    async def load(self, id_item: int) -> None:
+        """Load the placeholder and its event and bin."""
         res = await nebula.db.fetch(
             """
             SELECT
                 e.meta as emeta,
                 b.meta as bmeta,
                 i.meta as imeta
-            FROM events e, bins b, items i, assets a
+            FROM events e, bins b, items i
             WHERE e.id_magic = b.id AND i.id_bin = b.id AND i.id = $1
             """,
             id_item,
@@ -48,7 +85,8 @@ class SolverPlugin:
         await self.bin.get_items()
 
         assert self.bin.id  # shoudn't happen, keep mypy happy
-        self.affected_bins = [self.bin.id]
+        if self.bin.id not in self.affected_bins:
+            self.affected_bins.append(self.bin.id)
         self.new_items = []
         self.new_events = []
 
@@ -56,12 +94,19 @@ class SolverPlugin:
         self._needed_duration = await self.get_needed_duration(force=True)
         self._solve_next = None
 
-        return await self.main()
-
     #
     # Property loaders
     #
 
+    async def get_candidates(self) -> ChannelPool:
+        """Return assets which may be used on the current channel.
+
+        The pool is shared by all solvers and cached. Use its `filter`
+        method to select candidates. IDs of assets used during the
+        current run are available in `used_assets`.
+        """
+        return await candidate_pool.get(self.event["id_channel"])
+
     async def get_next_event(self, force: bool = False) -> nebula.Event | None:
         """Load event following the current one."""
         if (self._next_event is None) or force:
@@ -196,34 +241,62 @@ class SolverPlugin:
         if not self.new_items:
             return
 
-        i = 0
-        items = await self.bin.get_items()
-        for item in items:
-            i += 1
-            if item.id == self.placeholder.id:
-                await item.delete()
-                for new_item in self.new_items:
-                    i += 1
-                    new_item["id_bin"] = self.bin.id
-                    new_item["position"] = i
-                    await new_item.save(notify=False)
-            if item["position"] != i:
-                item["position"] = i
-                await item.save(notify=False)
-
-        if self.bin.id and self.bin.id not in self.affected_bins:
-            self.affected_bins.append(self.bin.id)
-
-        # save event in case solver updated its metadata
-        await self.event.save()
-
-        # another paceholder was created, so we need to solve it
-        if self._solve_next and self._solve_next.id:
-            await self(self._solve_next.id)
-            return
+        # Replace the placeholder with the new items and shift positions
+        # of the following ones. Everything is written in one transaction.
+        # Concurrent solvers of the same event write one after another,
+        # and the bin is read again once the lock is held.
+
+        pool = await nebula.db.pool()
+        async with pool.acquire() as conn, conn.transaction():
+            await conn.execute(
+                "SELECT pg_advisory_xact_lock($1, $2)",
+                EVENT_LOCK_CLASS,
+                self.event.id,
+            )
+            items = [
+                nebula.Item.from_meta(row["meta"], connection=conn)
+                for row in await conn.fetch(
+                    "SELECT meta FROM items WHERE id_bin = $1 ORDER BY position",
+                    self.bin.id,
+                )
+            ]
+            if self.placeholder.id not in [item.id for item in items]:
+                nebula.log.warn(
+                    f"{self.placeholder} has been solved by another run",
+                    user=self.name,
+                )
+                return
 
-        # recalculate bin durations and notify clients about changes
-        await bin_refresh(self.affected_bins)
+            to_save: list[nebula.Item] = []
+            position = 0
+            for item in items:
+                if item.id == self.placeholder.id:
+                    for new_item in self.new_items:
+                        position += 1
+                        new_item["id_bin"] = self.bin.id
+                        new_item["position"] = position
+                        to_save.append(new_item)
+                        if new_item["id_asset"]:
+                            self.used_assets.add(new_item["id_asset"])
+                    continue
+                position += 1
+                if item["position"] != position:
+                    item["position"] = position
+                    to_save.append(item)
+
+            self.placeholder.connection = conn
+            await self.placeholder.delete()
+            await nebula.Item.save_many(to_save, connection=conn, notify=False)
+            # save event in case solver updated its metadata
+            event_changed = self.event.is_changed
+            await nebula.Event.save_many([self.event], connection=conn, notify=False)
+
+        if event_changed:
+            await nebula.msg(
+                "objects_changed",
+                object_type="event",
+                objects=[self.event.id],
+            )
 
     #
     # Solver implementation
@@ -0,0 +1,163 @@
+"""Concurrent solving of multiple placeholders.
+
+Placeholders are grouped by their events. Each event is solved by its own
+instance of the solver plugin, so the solver state is never shared between
+concurrent runs.
+
+Solving an event may depend on the events solved before it on the same
+channel (for example, split blocks create new events, and solvers avoid
+repeating recently used assets). Events of a channel are therefore solved
+sequentially, in the order of their start times, and only different
+channels are solved concurrently, with a bounded parallelism. Placeholders
+of the same event are solved sequentially as well.
+
+Solvers write the items of an event while holding a transaction-level
+PostgreSQL advisory lock of the event, so writes of concurrent runs touching
+the same event (also across server workers) are serialized without holding
+an extra connection. Placeholders solved by another run are skipped.
+
+Progress is published as `solver_progress` messages, so clients may
+follow long runs over the websocket.
+"""
+
+import asyncio
+import time
+from typing import Any
+
+import nebula
+from nebula.common import create_hash
+from nebula.helpers.scheduling import enqueue_bin_refresh
+
+from .solver import SolverPlugin
+
+# Placeholders of events grouped by channel: {id_channel: {id_event: [id_item]}}
+ChannelPlaceholders = dict[int, dict[int, list[int]]]
+
+
+async def get_event_placeholders(id_items: list[int]) -> ChannelPlaceholders:
+    """Return placeholders grouped by their channels and events.
+
+    Events are ordered by start time,
+    placeholders by their position in the bin.
+    """
+    query = """
+        SELECT e.id_channel, e.id AS id_event, i.id AS id_item
+        FROM items AS i
+        JOIN events AS e ON e.id_magic = i.id_bin
+        WHERE i.id = ANY($1)
+        ORDER BY e.id_channel, e.start, i.position
+    """
+    result: ChannelPlaceholders = {}
+    async for row in nebula.db.iterate(query, id_items):
+        events = result.setdefault(row["id_channel"], {})
+        events.setdefault(row["id_event"], []).append(row["id_item"])
+    return result
+
+
+class SolverRun:
+    """Solve placeholders using concurrent instances of a solver"""
+
+    concurrency: int = 4
+
+    def __init__(
+        self,
+        plugin: SolverPlugin,
+        id_items: list[int],
+        user: nebula.User | None = None,
+        initiator: str | None = None,
+    ) -> None:
+        self.id = create_hash()[:16]
+        self.solver_class = type(plugin)
+        self.id_items = list(dict.fromkeys(id_items))
+        self.user = user
+        self.username = user.name if user else None
+        self.initiator = initiator
+        self.solved: list[int] = []
+        self.failed: list[int] = []
+        self.affected_bins: list[int] = []
+        self.started_at = time.time()
+
+    @property
+    def name(self) -> str:
+        return self.solver_class.name
+
+    async def progress(self, status: str, **data: Any) -> None:
+        await nebula.msg(
+            "solver_progress",
+            id=self.id,
+            solver=self.name,
+            status=status,
+            total=len(self.id_items),
+            solved=len(self.solved),
+            failed=len(self.failed),
+            initiator=self.initiator,
+            **data,
+        )
+
+    async def solve_event(self, id_event: int, id_items: list[int]) -> None:
+        solver = self.solver_class()
+        try:
+            bins = await solver.solve_placeholders(id_items)
+        except Exception:
+            nebula.log.traceback(
+                f"Unable to solve placeholders of event {id_event}",
+                user=self.username,
+            )
+            self.failed.extend(id_items)
+            # Items solved before the failure are stored
+            bins = solver.affected_bins
+        else:
+            self.solved.extend(id_items)
+        self.affected_bins.extend(bins)
+        await self.progress("running", id_event=id_event)
+
+    async def solve_channel(
+        self,
+        events: dict[int, list[int]],
+        semaphore: asyncio.Semaphore,
+    ) -> None:
+        """Solve events of a channel one by one"""
+        async with semaphore:
+            for id_event, id_items in events.items():
+                await self.solve_event(id_event, id_items)
+
+    async def run(self) -> "SolverRun":
+        channels = await get_event_placeholders(self.id_items)
+        found = {
+            id_item
+            for events in channels.values()
+            for id_items in events.values()
+            for id_item in id_items
+        }
+        if missing := set(self.id_items) - found:
+            nebula.log.warn(f"Placeholders {sorted(missing)} have no event")
+            self.failed.extend(sorted(missing))
+
+        nebula.log.info(
+            f"Solving {len(self.id_items)} placeholders "
+            f"of {sum(len(events) for events in channels.values())} events "
+            f"on {len(channels)} channels using {self.name}",
+            user=self.username,
+        )
+        await self.progress("started")
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(
+            *[self.solve_channel(events, semaphore) for events in channels.values()]
+        )
+
+        # recalculate bin durations and notify clients about changes
+        await enqueue_bin_refresh(
+            list(dict.fromkeys(self.affected_bins)),
+            initiator=self.initiator,
+            user=self.user,
+        )
+
+        elapsed = time.time() - self.started_at
+        nebula.log.info(
+            f"Solved {len(self.solved)} placeholders in {elapsed:.2f}s "
+            f"({len(self.failed)} failed)",
+            user=self.username,
+        )
+        await self.progress("failed" if self.failed else "finished")
+        return self
@@ -6,7 +6,7 @@ from pydantic import BaseModel
 from redis import asyncio as aioredis
 from redis.asyncio.client import PubSub
 
-from nebula.common import json_dumps, json_loads
+from nebula.common import json_dumpb, json_loads
 from nebula.config import config
 from nebula.log import log
 
@@ -54,7 +54,13 @@ class Redis:
             raise ValueError(f"Invalid JSON in {namespace}-{key}") from e
 
     @classmethod
-    async def set(cls, namespace: str, key: str, value: str, ttl: int = 0) -> None:
+    async def set(
+        cls,
+        namespace: str,
+        key: str,
+        value: str | bytes,
+        ttl: int = 0,
+    ) -> None:
         """Create/update a record in Redis
 
         Optional ttl argument may be provided to set expiration time.
@@ -71,12 +77,53 @@ class Redis:
         """Create/update a record in Redis with JSON-serialized value"""
         if not cls.connected:
             await cls.connect()
+        payload: str | bytes
         if isinstance(value, BaseModel):
             payload = value.model_dump_json(exclude_unset=True, exclude_defaults=True)
         else:
-            payload = json_dumps(value)
+            payload = json_dumpb(value)
         await cls.set(namespace, key, payload, ttl)
 
+    @classmethod
+    async def set_nx(
+        cls,
+        namespace: str,
+        key: str,
+        value: str | bytes,
+        ttl: int = 0,
+    ) -> bool:
+        """Create a record in Redis if it does not exist
+
+        Return True if the record was created.
+        """
+        if not cls.connected:
+            await cls.connect()
+        res = await cls.redis_pool.set(
+            f"{namespace}-{key}", value, nx=True, ex=ttl or None
+        )
+        return bool(res)
+
+    @classmethod
+    async def eval(
+        cls,
+        script: str,
+        namespace: str,
+        keys: list[str],
+        *args: str | bytes | int,
+    ) -> Any:
+        """Run a Lua script in Redis atomically
+
+        Keys passed to the script are prefixed with the namespace.
+        """
+        if not cls.connected:
+            await cls.connect()
+        return await cls.redis_pool.eval(
+            script,
+            len(keys),
+            *[f"{namespace}-{key}" for key in keys],
+            *args,
+        )
+
     @classmethod
     async def delete(cls, namespace: str, key: str) -> None:
         """Delete a record from Redis"""
@@ -99,6 +146,23 @@ class Redis:
             await cls.connect()
         await cls.redis_pool.expire(f"{namespace}-{key}", ttl)
 
+    @classmethod
+    async def sadd(cls, namespace: str, key: str, *values: str) -> None:
+        """Add values to a set stored in Redis"""
+        if not cls.connected:
+            await cls.connect()
+        await cls.redis_pool.sadd(f"{namespace}-{key}", *values)
+
+    @classmethod
+    async def spop(cls, namespace: str, key: str, count: int = 1) -> list[str]:
+        """Remove and return random values from a set stored in Redis"""
+        if not cls.connected:
+            await cls.connect()
+        values = await cls.redis_pool.spop(f"{namespace}-{key}", count)
+        if not isinstance(values, list | set):
+            return []
+        return [v.decode("utf-8") if isinstance(v, bytes) else v for v in values]
+
     @classmethod
     async def pubsub(cls) -> PubSub:
         """Create a Redis pubsub connection"""
@@ -107,7 +171,7 @@ class Redis:
         return cls.redis_pool.pubsub()
 
     @classmethod
-    async def publish(cls, message: str) -> None:
+    async def publish(cls, message: str | bytes) -> None:
         """Publish a message to a Redis channel"""
         if not cls.connected:
             await cls.connect()
@@ -87,6 +87,8 @@ CREATE INDEX IF NOT EXISTS idx_media_type ON assets(media_type);
 CREATE INDEX IF NOT EXISTS idx_status ON assets(id_folder);
 CREATE INDEX IF NOT EXISTS idx_ctime ON assets(ctime);
 CREATE INDEX IF NOT EXISTS idx_mtime ON assets(mtime);
+CREATE INDEX IF NOT EXISTS idx_ctime_id ON assets(ctime DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_mtime_id ON assets(mtime DESC, id DESC);
 
 -- BINS
 
@@ -139,16 +141,48 @@ CREATE TABLE IF NOT EXISTS public.users (
 
 -- FULLTEXT INDEX
 
+-- The index is partitioned by object type, so asset searches
+-- don't scan words of items, bins and events. Plain tables created
+-- by older versions are partitioned by setup before this script runs.
+
 CREATE TABLE IF NOT EXISTS public.ft (
   id INTEGER NOT NULL,
   object_type INTEGER NOT NULL,
   weight INTEGER DEFAULT 0,
   value VARCHAR(255)
-);
+) PARTITION BY LIST (object_type);
+
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM pg_class
+    WHERE relname = 'ft'
+    AND relnamespace = 'public'::regnamespace
+    AND relkind = 'p'
+  ) THEN
+    CREATE TABLE IF NOT EXISTS public.ft_assets PARTITION OF public.ft FOR VALUES IN (0);
+    CREATE TABLE IF NOT EXISTS public.ft_items PARTITION OF public.ft FOR VALUES IN (1);
+    CREATE TABLE IF NOT EXISTS public.ft_bins PARTITION OF public.ft FOR VALUES IN (2);
+    CREATE TABLE IF NOT EXISTS public.ft_events PARTITION OF public.ft FOR VALUES IN (3);
+    CREATE TABLE IF NOT EXISTS public.ft_default PARTITION OF public.ft DEFAULT;
+  END IF;
+END $$;
 
 CREATE INDEX IF NOT EXISTS idx_ft_id ON ft(id);
 CREATE INDEX IF NOT EXISTS idx_ft_type ON ft(object_type);
 CREATE INDEX IF NOT EXISTS idx_ft ON ft(value text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_ft_search
+  ON ft(object_type, value text_pattern_ops) INCLUDE (id, weight);
+
+-- Hash of the words stored in the ft table for each object,
+-- so unchanged indexes are not compared word by word on save
+
+CREATE TABLE IF NOT EXISTS public.ft_fingerprints (
+  object_type INTEGER NOT NULL,
+  id INTEGER NOT NULL,
+  fingerprint VARCHAR(64) NOT NULL,
+  CONSTRAINT ft_fingerprints_pkey PRIMARY KEY (object_type, id)
+);
 
 -- AUX
 
@@ -177,6 +211,16 @@ CREATE TABLE IF NOT EXISTS public.jobs (
   CONSTRAINT jobs_pkey PRIMARY KEY (id)
 );
 
+-- Jobs claimed using the dispatcher belong to their service until
+-- the lease expires. Jobs with an expired lease are requeued.
+
+ALTER TABLE public.jobs ADD COLUMN IF NOT EXISTS lease_until INTEGER;
+
+CREATE INDEX IF NOT EXISTS jobs_pending_idx
+  ON jobs(priority DESC, creation_time) WHERE status IN (0, 5);
+CREATE INDEX IF NOT EXISTS jobs_lease_idx
+  ON jobs(lease_until) WHERE status = 1;
+
 CREATE TABLE IF NOT EXISTS public.aux (
   id SERIAL NOT NULL,
   key VARCHAR(255) NOT NULL,
@@ -202,3 +246,51 @@ CREATE TABLE IF NOT EXISTS public.asrun (
 CREATE INDEX IF NOT EXISTS asrun_start_idx ON asrun(start);
 CREATE INDEX IF NOT EXISTS asrun_channel_idx ON asrun(id_channel);
 CREATE INDEX IF NOT EXISTS asrun_item_idx ON asrun(id_item);
+
+-- Latest run of each item. Maintained by a trigger on the asrun table,
+-- so rundowns don't need to scan the as-run history.
+
+CREATE TABLE IF NOT EXISTS public.asrun_latest (
+  id_item INTEGER NOT NULL,
+  id_channel INTEGER NOT NULL,
+  id_asrun INTEGER NOT NULL,
+  start INTEGER NOT NULL,
+  stop INTEGER,
+  CONSTRAINT asrun_latest_pkey PRIMARY KEY (id_item)
+);
+
+CREATE INDEX IF NOT EXISTS asrun_latest_channel_idx
+  ON asrun_latest(id_channel, start);
+
+CREATE OR REPLACE FUNCTION update_asrun_latest() RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.id_item IS NOT NULL THEN
+    -- The record might have been the latest one. Select it again.
+    DELETE FROM asrun_latest WHERE id_item = OLD.id_item AND id_asrun = OLD.id;
+    INSERT INTO asrun_latest (id_item, id_channel, id_asrun, start, stop)
+      SELECT id_item, id_channel, id, start, stop FROM asrun
+      WHERE id_item = OLD.id_item
+      ORDER BY start DESC, id DESC LIMIT 1
+    ON CONFLICT (id_item) DO NOTHING;
+  END IF;
+
+  IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.id_item IS NOT NULL THEN
+    INSERT INTO asrun_latest (id_item, id_channel, id_asrun, start, stop)
+      VALUES (NEW.id_item, NEW.id_channel, NEW.id, NEW.start, NEW.stop)
+    ON CONFLICT (id_item) DO UPDATE SET
+      id_channel = EXCLUDED.id_channel,
+      id_asrun = EXCLUDED.id_asrun,
+      start = EXCLUDED.start,
+      stop = EXCLUDED.stop
+    WHERE (asrun_latest.start, asrun_latest.id_asrun)
+      <= (EXCLUDED.start, EXCLUDED.id_asrun);
+  END IF;
+
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS asrun_latest_trigger ON asrun;
+CREATE TRIGGER asrun_latest_trigger
+  AFTER INSERT OR UPDATE OR DELETE ON asrun
+  FOR EACH ROW EXECUTE FUNCTION update_asrun_latest();
@@ -0,0 +1,77 @@
+import asyncio
+
+from redis.exceptions import RedisError
+
+import nebula
+from nebula.helpers.scheduling import (
+    BIN_REFRESH_NAMESPACE,
+    BIN_REFRESH_QUEUE,
+    refresh_bins,
+)
+from server.background import BackgroundTask
+
+
+class BinRefreshQueue(BackgroundTask):
+    """Refresh bins requested using `enqueue_bin_refresh`.
+
+    Requests are stored in a Redis set, so bins requested several times
+    during the interval are refreshed only once. The set is shared by
+    all server workers and each request is popped by only one of them.
+    Requests of bins which failed to refresh are put back to the set.
+    """
+
+    interval: float = 0.5
+    retry_delay: float = 5
+    batch_size: int = 1000
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.main()
+            except (ConnectionError, RedisError):
+                await asyncio.sleep(5)
+
+    async def main(self) -> None:
+        requests = await nebula.redis.spop(
+            BIN_REFRESH_NAMESPACE,
+            BIN_REFRESH_QUEUE,
+            self.batch_size,
+        )
+        if not requests:
+            return
+
+        # Each bin is refreshed once. When it was requested multiple
+        # times, the last request determines the author of the change.
+
+        authors: dict[int, tuple[int, str]] = {}
+        for request in requests:
+            try:
+                bin_key, user_key, initiator = request.split(":", 2)
+                authors[int(bin_key)] = (int(user_key), initiator)
+            except ValueError:
+                nebula.log.warn(f"Invalid bin refresh request: {request}")
+
+        batches: dict[tuple[int, str], list[int]] = {}
+        for id_bin, author in authors.items():
+            batches.setdefault(author, []).append(id_bin)
+
+        failed: list[str] = []
+        for (id_user, initiator), bins in batches.items():
+            try:
+                await refresh_bins(
+                    sorted(bins),
+                    initiator=initiator or None,
+                    id_user=id_user or None,
+                )
+            except Exception:
+                nebula.log.traceback(f"Unable to refresh bins {bins}")
+                failed.extend(f"{id_bin}:{id_user}:{initiator}" for id_bin in bins)
+
+        if failed:
+            # Popped requests would be lost otherwise
+            await nebula.redis.sadd(BIN_REFRESH_NAMESPACE, BIN_REFRESH_QUEUE, *failed)
+            await asyncio.sleep(self.retry_delay)
+
+
+bin_refresh_queue = BinRefreshQueue()
@@ -1,8 +1,10 @@
+from collections.abc import AsyncGenerator
 from typing import Annotated
 
 from fastapi import Depends, Header, Path, Query, Request
 
 import nebula
+from nebula.objects.identity_map import identity_map_scope
 from server.session import Session
 from server.utils import parse_access_token
 
@@ -36,6 +38,16 @@ async def api_key(
 ApiKey = Annotated[str | None, Depends(api_key)]
 
 
+async def identity_map() -> AsyncGenerator[None]:
+    """Cache objects loaded during the request in an identity map.
+
+    Repeated loads of the same asset, item, bin or event then
+    don't hit the database. See nebula.objects.identity_map.
+    """
+    with identity_map_scope():
+        yield
+
+
 async def request_initiator(x_client_id: str | None = Header(None)) -> str | None:
     """Return the client ID of the request initiator."""
     return x_client_id
@@ -8,6 +8,7 @@ from nebula.common import classes_from_module, import_module
 from nebula.plugins.library import plugin_library
 from nx.utils import slugify
 from server.context import ScopedEndpoint, server_context
+from server.dependencies import identity_map
 from server.request import APIRequest
 
 
@@ -103,9 +104,14 @@ def install_endpoints(app: fastapi.FastAPI) -> None:
                 )
             )
 
+        dependencies = []
+        if endpoint.identity_map:
+            dependencies.append(fastapi.Depends(identity_map))
+
         app.router.add_api_route(
             route,
             endpoint.handle,
+            dependencies=dependencies,
             name=endpoint.title or endpoint.name,
             operation_id=slugify(endpoint.name, separator="_"),
             methods=endpoint.methods,
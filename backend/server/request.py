@@ -14,3 +14,5 @@ class APIRequest:
     exclude_none: bool = True
     exclude_unset: bool = False
     scopes: list[str] | None = None
+    # Use a request-scoped identity map for loaded objects
+    identity_map: bool = True
@@ -0,0 +1,33 @@
+import asyncio
+from typing import Any
+
+import nebula
+from api.rundown.updates import apply_changes, is_rundown_change
+from server.background import BackgroundTask
+
+
+class RundownUpdater(BackgroundTask):
+    """Apply object changes to cached rundowns in the background.
+
+    Messaging listeners run before messages are relayed to clients,
+    so the listener only queues the changes. They are applied one
+    by one, in the order they were received.
+    """
+
+    def initialize(self) -> None:
+        self.queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+
+    async def on_message(self, message: dict[str, Any]) -> None:
+        if is_rundown_change(message):
+            self.queue.put_nowait(message)
+
+    async def run(self) -> None:
+        while True:
+            message = await self.queue.get()
+            try:
+                await apply_changes(message)
+            except Exception:
+                nebula.log.traceback("Unable to update cached rundowns")
+
+
+rundown_updater = RundownUpdater()
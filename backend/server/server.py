@@ -10,11 +10,16 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.websockets import WebSocket, WebSocketDisconnect
 
 import nebula
+from api.browse import browse_cache
+from api.jobs.dispatcher import pending_jobs
 from nebula.exceptions import NebulaException, NotFoundException
+from nebula.plugins.candidates import candidate_pool
 from nebula.plugins.frontend import get_frontend_plugins
 from nebula.settings import load_settings
+from server.bin_refresh_queue import bin_refresh_queue
 from server.endpoints import install_endpoints
 from server.middleware.session import SessionMiddleware
+from server.rundown_updater import rundown_updater
 from server.storage_monitor import storage_monitor
 from server.websocket import messaging
 
@@ -25,14 +30,24 @@ async def lifespan(app: FastAPI):  # type: ignore
     async with aiofiles.open("/var/run/nebula.pid", "w") as f:
         await f.write(str(os.getpid()))
     await load_settings()
+    # Server-side caches are updated before clients receive the messages
+    # (cached rundowns are only queued and updated in the background)
+    messaging.add_listener(candidate_pool.on_message)
+    messaging.add_listener(browse_cache.on_message)
+    messaging.add_listener(rundown_updater.on_message)
+    messaging.add_listener(pending_jobs.on_message)
     messaging.start()
     storage_monitor.start()
+    bin_refresh_queue.start()
+    rundown_updater.start()
     nebula.log.success("Server started")
 
     yield
 
     nebula.log.info("Stopping server...")
     await messaging.shutdown()
+    await bin_refresh_queue.shutdown()
+    await rundown_updater.shutdown()
     nebula.log.info("Server stopped")
 
 
@@ -1,6 +1,8 @@
 import asyncio
+import socket
 import time
 import uuid
+from collections.abc import Awaitable, Callable
 from contextlib import suppress
 from typing import Any
 
@@ -15,6 +17,8 @@ ALWAYS_SUBSCRIBE = [
     "server.started",
 ]
 
+MessageListener = Callable[[dict[str, Any]], Awaitable[None]]
+
 
 class Client:
     def __init__(self, sock: WebSocket):
@@ -42,12 +46,16 @@ class Client:
         return False
 
     async def send(self, message: dict[str, Any], auth_only: bool = True) -> None:
+        await self.send_payload(json_dumps(message), auth_only=auth_only)
+
+    async def send_payload(self, payload: str, auth_only: bool = True) -> None:
+        """Send an already serialized message"""
         if (not self.authorized) and auth_only:
             return
         if not self.is_valid:
             return
         try:
-            await self.sock.send_text(json_dumps(message))
+            await self.sock.send_text(payload)
         except WebSocketDisconnect:
             self.disconnected = True
         except Exception as e:
@@ -79,6 +87,53 @@ class Messaging(BackgroundTask):
     def initialize(self) -> None:
         self.clients: dict[str, Client] = {}
         self.error_rate_data = []
+        self.listeners: list[MessageListener] = []
+
+    def add_listener(self, listener: MessageListener) -> None:
+        """Register a coroutine called with every message received from Redis.
+
+        Listeners are awaited before the message is forwarded to the
+        websocket clients, so server-side caches may be invalidated
+        before the clients react to the message.
+        """
+        self.listeners.append(listener)
+
+    async def dispatch(self, message: dict[str, Any]) -> None:
+        """Send a message to all clients subscribed to its topic"""
+        # Message is serialized once and only if there
+        # is at least one client subscribed to its topic
+        payload: str | None = None
+        clients = list(self.clients.values())
+        for client in clients:
+            for topic in client.topics:
+                if topic == "*" or message["topic"].startswith(topic):
+                    if payload is None:
+                        payload = json_dumps(message)
+                    await client.send_payload(payload)
+                    break
+
+    async def send_local(self, topic: str, **data: Any) -> None:
+        """Send a message to clients connected to this server process only.
+
+        Unlike nebula.msg, the message is not published to Redis,
+        so it is not delivered to other workers and services.
+        """
+        await self.dispatch(
+            {
+                "timestamp": time.time(),
+                "site": nebula.config.site_name,
+                "host": socket.gethostname(),
+                "topic": topic,
+                "data": data,
+            }
+        )
+
+    async def notify_listeners(self, message: dict[str, Any]) -> None:
+        for listener in self.listeners:
+            try:
+                await listener(message)
+            except Exception:
+                nebula.log.traceback("Message listener failed")
 
     async def join(self, websocket: WebSocket) -> Client | None:
         if not self.is_running:
@@ -131,17 +186,15 @@ class Messaging(BackgroundTask):
                         "data": data[4],
                     }
 
+                if raw_message is not None:
+                    await self.notify_listeners(message)
+
                 if message["topic"] == "log":
                     assert isinstance(message["data"], dict)
                     if message["data"].get("level", 0) > 3:
                         self.handle_error_log()
 
-                clients = list(self.clients.values())
-                for client in clients:
-                    for topic in client.topics:
-                        if topic == "*" or message["topic"].startswith(topic):
-                            await client.send(message)
-                            break
+                await self.dispatch(message)
                 await self.purge()
 
             except Exception:
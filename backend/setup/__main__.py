@@ -7,7 +7,9 @@ import asyncpg
 from nebula.db import DB, DatabaseConnection
 from nebula.log import log
 from nebula.objects.user import User
+from setup.asrun import rebuild_asrun_latest
 from setup.dump import dump_settings
+from setup.fulltext import partition_ft
 from setup.settings import setup_settings
 
 log.user = "setup"
@@ -69,8 +71,10 @@ async def main() -> None:
         return
 
     else:
+        await partition_ft(db)
         await create_schema(db)
         await create_default_user(db)
+        await rebuild_asrun_latest(db, force="--rebuild-asrun-latest" in sys.argv)
 
         pool = await db.pool()
         async with pool.acquire() as conn, conn.transaction():
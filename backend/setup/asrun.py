@@ -0,0 +1,33 @@
+from nebula.db import DB
+from nebula.log import log
+
+
+async def rebuild_asrun_latest(db: DB, force: bool = False) -> None:
+    """Populate the asrun_latest table from the as-run history.
+
+    The table is maintained by a trigger, so this is only needed
+    when it is created on an existing database (then it is empty)
+    or when forced using the --rebuild-asrun-latest argument.
+    """
+    if not force:
+        res = await db.fetch("SELECT 1 FROM asrun_latest LIMIT 1")
+        if res:
+            return
+        res = await db.fetch("SELECT 1 FROM asrun LIMIT 1")
+        if not res:
+            return
+
+    log.info("Rebuilding latest as-run records")
+    pool = await db.pool()
+    async with pool.acquire() as conn, conn.transaction():
+        await conn.execute("LOCK TABLE asrun IN SHARE MODE")
+        await conn.execute("DELETE FROM asrun_latest")
+        await conn.execute(
+            """
+            INSERT INTO asrun_latest (id_item, id_channel, id_asrun, start, stop)
+            SELECT DISTINCT ON (id_item) id_item, id_channel, id, start, stop
+            FROM asrun
+            WHERE id_item IS NOT NULL
+            ORDER BY id_item, start DESC, id DESC
+            """
+        )
@@ -0,0 +1,53 @@
+from nebula.db import DB
+from nebula.log import log
+
+
+async def partition_ft(db: DB) -> None:
+    """Convert a plain full-text index table to a partitioned one.
+
+    New installations create the ft table partitioned by object type.
+    Tables created by older versions are migrated here: rows are moved
+    to a new partitioned table and the old one is dropped. Indexes
+    are created afterwards by the schema script.
+    """
+    res = await db.fetch(
+        """
+        SELECT relkind FROM pg_class
+        WHERE relname = 'ft'
+        AND relnamespace = 'public'::regnamespace
+        """
+    )
+    if not res or res[0]["relkind"] != "r":
+        return
+
+    log.info("Partitioning the full-text index")
+    pool = await db.pool()
+    async with pool.acquire() as conn, conn.transaction():
+        await conn.execute("LOCK TABLE ft IN ACCESS EXCLUSIVE MODE")
+        await conn.execute("ALTER TABLE ft RENAME TO ft_unpartitioned")
+        await conn.execute(
+            "DROP INDEX IF EXISTS idx_ft_id, idx_ft_type, idx_ft, idx_ft_search"
+        )
+        await conn.execute(
+            """
+            CREATE TABLE public.ft (
+              id INTEGER NOT NULL,
+              object_type INTEGER NOT NULL,
+              weight INTEGER DEFAULT 0,
+              value VARCHAR(255)
+            ) PARTITION BY LIST (object_type);
+
+            CREATE TABLE public.ft_assets PARTITION OF public.ft FOR VALUES IN (0);
+            CREATE TABLE public.ft_items PARTITION OF public.ft FOR VALUES IN (1);
+            CREATE TABLE public.ft_bins PARTITION OF public.ft FOR VALUES IN (2);
+            CREATE TABLE public.ft_events PARTITION OF public.ft FOR VALUES IN (3);
+            CREATE TABLE public.ft_default PARTITION OF public.ft DEFAULT;
+            """
+        )
+        await conn.execute(
+            """
+            INSERT INTO ft (id, object_type, weight, value)
+            SELECT id, object_type, weight, value FROM ft_unpartitioned
+            """
+        )
+        await conn.execute("DROP TABLE ft_unpartitioned")
@@ -0,0 +1,46 @@
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+import nebula
+from nebula.helpers import scheduling
+from server.bin_refresh_queue import BinRefreshQueue
+
+
+@pytest.mark.asyncio
+async def test_enqueue_falls_back_to_sync_refresh(monkeypatch):
+    async def sadd(*args):
+        raise RedisConnectionError("Redis is down")
+
+    refreshed = []
+
+    async def bin_refresh(bins, initiator=None, user=None):
+        refreshed.append((bins, initiator))
+
+    monkeypatch.setattr(nebula.redis, "sadd", sadd)
+    monkeypatch.setattr(scheduling, "bin_refresh", bin_refresh)
+
+    await scheduling.enqueue_bin_refresh([1, 2], initiator="test")
+    assert refreshed == [([1, 2], "test")]
+
+
+@pytest.mark.asyncio
+async def test_failed_requests_are_requeued(monkeypatch):
+    async def spop(*args):
+        return ["1:5:test", "2:5:test"]
+
+    requeued = []
+
+    async def sadd(namespace, key, *values):
+        requeued.extend(values)
+
+    async def refresh_bins(*args, **kwargs):
+        raise RuntimeError("Database is down")
+
+    monkeypatch.setattr(nebula.redis, "spop", spop)
+    monkeypatch.setattr(nebula.redis, "sadd", sadd)
+    monkeypatch.setattr("server.bin_refresh_queue.refresh_bins", refresh_bins)
+
+    queue = BinRefreshQueue()
+    queue.retry_delay = 0
+    await queue.main()
+    assert sorted(requeued) == ["1:5:test", "2:5:test"]
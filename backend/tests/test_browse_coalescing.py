@@ -0,0 +1,28 @@
+import asyncio
+
+import pytest
+
+from api import browse
+
+
+@pytest.mark.asyncio
+async def test_identical_browse_requests_share_query(monkeypatch):
+    calls = []
+
+    async def fetch_page(query, limit, order_by, order_dir):
+        calls.append(query)
+        await asyncio.sleep(0.01)
+        return [{"id": 1}], None
+
+    monkeypatch.setattr(browse, "fetch_page", fetch_page)
+    await browse.browse_cache.invalidate()
+
+    pages = await asyncio.gather(
+        *[browse.get_page("SELECT 1", 10, "id", "asc") for _ in range(5)]
+    )
+    assert len(calls) == 1
+    assert all(page == ([{"id": 1}], None) for page in pages)
+
+    # Different queries are not coalesced
+    await browse.get_page("SELECT 2", 10, "id", "asc")
+    assert calls == ["SELECT 1", "SELECT 2"]
@@ -0,0 +1,46 @@
+import nebula
+from nebula.objects.identity_map import IdentityMap
+
+
+def test_nested_mutation_is_changed():
+    asset = nebula.Asset.from_meta(
+        {
+            "id": 1,
+            "title": "Test",
+            "subclips": [{"mark_in": 0, "mark_out": 10, "title": "Intro"}],
+        }
+    )
+    assert not asset.is_changed
+
+    asset.meta["subclips"][0]["mark_out"] = 20
+    assert asset.changed_keys == {"subclips"}
+    assert asset.is_changed
+
+    asset._reset_changes()
+    assert not asset.is_changed
+
+
+def test_removed_key_is_changed():
+    asset = nebula.Asset.from_meta({"id": 1, "title": "Test"})
+    del asset.meta["title"]
+    assert asset.removed_keys == {"title"}
+    assert asset.is_changed
+
+
+def test_equal_nested_value_is_not_changed():
+    asset = nebula.Asset.from_meta({"id": 1, "subclips": [{"title": "Intro"}]})
+    asset["subclips"] = [{"title": "Intro"}]
+    assert not asset.is_changed
+
+
+def test_identity_map_copies_are_independent():
+    identity_map = IdentityMap()
+    identity_map.set("asset", 1, {"id": 1, "subclips": [{"title": "Intro"}]})
+
+    meta = identity_map.get("asset", 1)
+    assert meta is not None
+    meta["subclips"][0]["title"] = "Outro"
+    assert identity_map.get("asset", 1) == {
+        "id": 1,
+        "subclips": [{"title": "Intro"}],
+    }
@@ -156,13 +156,17 @@ const JobsPage = () => {
 
   const handlePubSub = (topic, message) => {
     if (topic !== 'job_progress') return;
+    // Progress of multiple jobs may be sent in a single message
+    const updates = message.jobs || [message];
     setJobs((prevData) => {
       const newData = [...prevData];
-      const index = newData.findIndex((job) => job.id === message.id);
-      if (index !== -1) {
-        newData[index]['status'] = message.status;
-        newData[index]['progress'] = message.progress;
-        newData[index]['message'] = message.message;
+      for (const update of updates) {
+        const index = newData.findIndex((job) => job.id === update.id);
+        if (index !== -1) {
+          newData[index]['status'] = update.status;
+          newData[index]['progress'] = update.progress;
+          newData[index]['message'] = update.message;
+        }
       }
       return newData;
     });
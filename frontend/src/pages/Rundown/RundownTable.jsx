@@ -1,6 +1,7 @@
 import { useMemo, useRef, useEffect } from 'react';
 import { useSelector } from 'react-redux';
 import { useSearchParams, useLocation } from 'react-router-dom';
+import { toast } from 'react-toastify';
 
 import nebula from '/src/nebula';
 import { Table } from '/src/components';
@@ -143,7 +144,18 @@ const RundownTable = ({
       )
       .map((row) => row.id);
     // TODO: dialog to select solver
-    nebula.request('solve', { solver, items }).then(loadRundown).catch(onError);
+    nebula
+      .request('solve', { solver, items })
+      .then((response) => {
+        const { failed } = response.data;
+        if (failed?.length) {
+          toast.error(
+            `Unable to solve ${failed.length} of ${items.length} placeholders`
+          );
+        }
+        loadRundown();
+      })
+      .catch(onError);
   };
 
   const updateObject = (object_type, id, data) => {